@@ -1,9 +1,14 @@
 import re
+import asyncio
 import httpx
 from utils.db_access import search_housing_by_condition
 from utils.region_map import get_region_code
 from api.lh_api import get_notices_by_house_ids
-from utils.vectordb_search import search_notice_in_vectordb
+from utils.vectordb_search import search_notice_in_vectordb, warm_notice_index
+from utils.executor import run_blocking
+from utils.streaming import astream_llm
+from utils.history import HistoryManager
+from utils.answer_cache import notice_answer_cache
 import markdown  # 파일 상단 import 부분에 추가
 
 QUESTION_TEXT = {
@@ -17,6 +22,17 @@ QUESTION_TEXT = {
     "자동차가액": "자동차 가액을 입력해주세요 (숫자)"
 }
 
+# ✅ 공고 Q&A 대화 기록: system 메시지만 고정, 최근 턴 + 요약을 다음 질문의 맥락으로 사용
+#    - 이전 대화를 가리키는 후속 질문("그럼 그건?", "아까 말한 …")만 대화 기록과 함께 답변 (캐시 안 함)
+#    - 그 외 질문은 검색 청크 + 질문만으로 답변 → 대화와 무관하므로 공고 답변 캐시로 다른 사용자와 공유
+HOUSING_PINNED = 1
+housing_memory = HistoryManager("housing_history", "housing_memory")
+_FOLLOW_UP = re.compile(
+    r"^(그럼|그러면|그런데|근데|그리고|또|그건|그거|그게|그것|이건|이거|이게|저건|저거|거기|그 )"
+    r"|아까|방금|위에서|앞에서|말한|말했|그 공고|그 중|그중"
+)
+FOLLOW_UP_MAX_CHARS = 6  # "왜?", "얼마야?" 처럼 짧은 질문도 앞 대화에 기대는 후속 질문으로 봄
+
 # FastAPI로 데이터를 비동기적으로 보내는 함수
 async def send_to_fastapi(data):
     url = "http://localhost:8000/housing-data" 
@@ -41,7 +57,11 @@ def extract_number(text):
         return int(numbers[0])
     return None
 
-def housing_agent(state, llm):
+def _collect_user_data(state):
+    """
+    종료/초기화 명령과 자격 정보 수집 단계.
+    이번 턴의 응답이 여기서 정해지면 그 상태를 반환하고, 다음 단계로 넘어가야 하면 None
+    """
     # ✅ 'exit' 명령 → 상태 초기화 및 상담 종료 처리
     if is_exit_command(state["query"]):
         state.clear()  # 상태 초기화
@@ -100,113 +120,235 @@ def housing_agent(state, llm):
                     }
             break
 
-    # ✅ 사용자 정보 다 받으면 → 한 번에 유형 + 공고 출력
-    if not state.get("housing_recommended"):
-        user_data = state["housing_user_data"]
-        house_list = search_housing_by_condition(user_data)
-        if not house_list:
-            return {**state, "result": "❌ 조건에 맞는 임대주택 유형이 없습니다. 다른 조건을 입력해주세요."}
-
-        region_code = get_region_code(user_data.get("희망거주지"))
-        notices = get_notices_by_house_ids([row["house_id"] for row in house_list], region_code)
-        if not notices:
-            return {**state, "result": "❌ 현재 신청 가능한 공고가 없습니다. 다른 조건을 입력해주세요."}
-
-        state["housing_notices"] = notices
-        state["housing_recommended"] = True
-
-     # ✅ 임대주택 유형 안내 (HTML 리스트)
-        types_text = "<ul>" + "".join(
-            f"<li>{row['house_name']} ({row['supply_type']})</li>" for row in house_list
-        ) + "</ul>"
-
-        # ✅ 공고 리스트 안내 (HTML 번호 매긴 리스트)
-        notice_list_text = "<ol>" + "".join(
-            f"<li>{n['PAN_NM']}</li>" for n in notices
-        ) + "</ol>"
-
-        state["result"] = (
-            f"✅ 신청 가능한 임대주택 유형:\n{types_text}\n\n"
-            f"✅ 진행 중인 추천 공고:\n{notice_list_text}\n\n"
-            "원하는 공고 번호를 입력해주세요.\n"
-            # "👉 새로운 조건으로 검색하려면 'new', 대화를 종료하려면 'exit'를 입력해주세요."
-        )
-        return state
+    return None
 
-    # ✅ 사용자가 공고 선택
-    if state.get("housing_recommended"):
-        if "change" in state["query"].lower():
-            state["housing_selected_notice"] = None
-            return {
-                **state,
-                "result": "공고를 다시 선택해주세요. 번호를 입력해주세요."
-            }
-
-        if not state.get("housing_selected_notice"):
-            notices = state.get("housing_notices", [])
-            try:
-                idx = int(state["query"].strip()) - 1
-                if 0 <= idx < len(notices):
-                    state["housing_selected_notice"] = notices[idx]
-                    return {
-                        **state,
-                        "result": f"✅ 선택한 공고: {notices[idx]['PAN_NM']}\n이제 궁금한 점을 입력해주세요!"
-                    }
-                else:
-                    return {**state, "result": "⚠️ 올바른 번호를 입력해주세요."}
-            except:
-                return {**state, "result": "⚠️ 번호를 입력해주세요."}
 
-        # ✅ 선택된 공고에 대한 Q&A (벡터검색 → LLM이 답변 생성)
-        notice_id = state["housing_selected_notice"]["PAN_ID"]
-        query = state["query"]
-        print(query,notice_id)
-        results = search_notice_in_vectordb(query=query, notice_id=notice_id)
+def _recommend_notices(state):
+    """사용자 정보 다 받으면 → 한 번에 유형 + 공고 출력 (SQLite + LH API, 블로킹)"""
+    user_data = state["housing_user_data"]
+    house_list = search_housing_by_condition(user_data)
+    if not house_list:
+        return {**state, "result": "❌ 조건에 맞는 임대주택 유형이 없습니다. 다른 조건을 입력해주세요."}
+
+    region_code = get_region_code(user_data.get("희망거주지"))
+    notices = get_notices_by_house_ids([row["house_id"] for row in house_list], region_code)
+    if not notices:
+        return {**state, "result": "❌ 현재 신청 가능한 공고가 없습니다. 다른 조건을 입력해주세요."}
+
+    state["housing_notices"] = notices
+    state["housing_recommended"] = True
+
+    # ✅ 임대주택 유형 안내 (HTML 리스트)
+    types_text = "<ul>" + "".join(
+        f"<li>{row['house_name']} ({row['supply_type']})</li>" for row in house_list
+    ) + "</ul>"
+
+    # ✅ 공고 리스트 안내 (HTML 번호 매긴 리스트)
+    notice_list_text = "<ol>" + "".join(
+        f"<li>{n['PAN_NM']}</li>" for n in notices
+    ) + "</ol>"
+
+    state["result"] = (
+        f"✅ 신청 가능한 임대주택 유형:\n{types_text}\n\n"
+        f"✅ 진행 중인 추천 공고:\n{notice_list_text}\n\n"
+        "원하는 공고 번호를 입력해주세요.\n"
+        # "👉 새로운 조건으로 검색하려면 'new', 대화를 종료하려면 'exit'를 입력해주세요."
+    )
+    return state
 
-        print(results)
 
-        if not results:
-            state["result"] = (
-                "❌ 관련 정보를 찾을 수 없습니다.\n\n"
-                # "👉 새로운 조건으로 검색하려면 'new', 대화를 종료하려면 'exit'를 입력해주세요."
-            )
-            return state
+def _select_notice(state):
+    """공고 선택/변경 단계. 응답이 정해지면 반환하고, 선택된 공고 Q&A로 넘어가야 하면 None"""
+    if "change" in state["query"].lower():
+        state["housing_selected_notice"] = None
+        return {
+            **state,
+            "result": "공고를 다시 선택해주세요. 번호를 입력해주세요."
+        }
 
-            
+    if not state.get("housing_selected_notice"):
+        notices = state.get("housing_notices", [])
+        try:
+            idx = int(state["query"].strip()) - 1
+            if 0 <= idx < len(notices):
+                state["housing_selected_notice"] = notices[idx]
+                return {
+                    **state,
+                    "result": f"✅ 선택한 공고: {notices[idx]['PAN_NM']}\n이제 궁금한 점을 입력해주세요!"
+                }
+            else:
+                return {**state, "result": "⚠️ 올바른 번호를 입력해주세요."}
+        except:
+            return {**state, "result": "⚠️ 번호를 입력해주세요."}
 
+    return None
 
-        # ✅ 벡터 검색 결과를 LLM에게 주고 답변 생성
-        chunks_text = "\n".join(
-            f"- {doc.page_content.strip()}" for doc in results
-        )
 
+def _just_selected(reply):
+    """이번 턴에 공고가 새로 선택됐으면 PAN_ID (공고별 검색 색인을 미리 만들기 위함)"""
+    selected = reply.get("housing_selected_notice") if reply else None
+    return selected["PAN_ID"] if selected and reply.get("result", "").startswith("✅ 선택한 공고") else None
 
-        pages = [docs.metadata.get('page') for docs in results]
-        notice_id = results[0].metadata.get('notice_id')
 
-        print("페이지번호 중복제거:", pages)
-        print("notice_id: ", notice_id)
+_warm_tasks = set()
 
 
-        state["pages"] = pages[0]
-        state["pages_flag"] = True
-        state["notice_id"] = notice_id
+def _search_selected_notice(state):
+    """선택된 공고에서 질문과 관련된 청크 검색 (벡터검색, 블로킹)"""
+    notice_id = state["housing_selected_notice"]["PAN_ID"]
+    query = state["query"]
+    print(query, notice_id)
+    results = search_notice_in_vectordb(query=query, notice_id=notice_id)
+    print(results)
+    return results
 
-        data_to_send = {
-            "pages": pages,
-            "notice_id": notice_id
-        }
 
+def _not_found(state):
+    state["result"] = (
+        "❌ 관련 정보를 찾을 수 없습니다.\n\n"
+        # "👉 새로운 조건으로 검색하려면 'new', 대화를 종료하려면 'exit'를 입력해주세요."
+    )
+    return state
+
+
+def _build_notice_prompt(state, results):
+    """벡터 검색 결과를 LLM 프롬프트로 만들고 페이지/공고 정보를 상태에 기록"""
+    chunks_text = "\n".join(
+        f"- {doc.page_content.strip()}" for doc in results
+    )
+
+    pages = [docs.metadata.get('page') for docs in results]
+    notice_id = results[0].metadata.get('notice_id')
+
+    print("페이지번호 중복제거:", pages)
+    print("notice_id: ", notice_id)
+
+    state["pages"] = pages[0]
+    state["pages_flag"] = True
+    state["notice_id"] = notice_id
 
-        prompt = (
-            f"너는 주택 청약 상담사야. 아래 [자료]를 참고해 [질문]에 친절하고 쉽게 답변해 줘.\n\n"
-            f"[자료]\n{chunks_text}\n\n"
-            f"[질문]\n{query}"
-        )
+    return (
+        f"너는 주택 청약 상담사야. 아래 [자료]를 참고해 [질문]에 친절하고 쉽게 답변해 줘.\n\n"
+        f"[자료]\n{chunks_text}\n\n"
+        f"[질문]\n{state['query']}"
+    )
 
-        answer = llm.invoke(prompt)
+
+def _is_follow_up(state) -> bool:
+    """이전 대화가 있고 질문이 그 대화를 가리키면 True"""
+    if not housing_memory.has_context(state, HOUSING_PINNED):
+        return False
+    query = state["query"].strip()
+    return len(query) <= FOLLOW_UP_MAX_CHARS or bool(_FOLLOW_UP.search(query))
+
+
+def _answer_key(state, results):
+    """공고 답변 캐시 키. 후속 질문은 답변이 이 대화에 맞춰지므로 None (캐시 조회/저장 안 함)"""
+    if _is_follow_up(state):
+        notice_answer_cache.skip()
+        return None
+    return notice_answer_cache.key(state["housing_selected_notice"]["PAN_ID"], state["query"], results)
+
+
+def _notice_messages(state, key, prompt):
+    """후속 질문(key 없음)은 대화 기록 + 요약과 함께, 나머지는 고정 system 메시지 + 프롬프트만"""
+    extra = [{"role": "user", "content": prompt}]
+    if key is None:
+        return housing_memory.messages(state, HOUSING_PINNED, extra=extra)
+    return state["housing_history"][:HOUSING_PINNED] + extra
+
+
+def _cached_answer(state, key):
+    """같은 공고·질문·검색 청크의 답변이 캐시에 있으면 결과/페이지를 상태에 기록하고 답변 원문 반환"""
+    if key is None:
+        return None
+    cached = notice_answer_cache.get(key)
+    if cached is None:
+        return None
+    answer, html, pages = cached
+    state["pages"] = pages
+    state["pages_flag"] = True
+    state["notice_id"] = key[0]
+    state["result"] = html
+    return answer
+
+
+def _record_turn(state, answer, llm):
+    """기록에는 검색 자료 없이 질문 원문과 답변만 남김 (다음 질문의 맥락용)"""
+    housing_memory.append(state, "user", state["query"])
+    housing_memory.append(state, "assistant", answer)
+    housing_memory.compact(state, HOUSING_PINNED, llm)
+
+
+def housing_agent(state, llm):
+    reply = _collect_user_data(state)
+    if reply is not None:
+        return reply
+
+    if not state.get("housing_recommended"):
+        return _recommend_notices(state)
+
+    # ✅ 사용자가 공고 선택 (선택 즉시 공고별 검색 색인 생성)
+    reply = _select_notice(state)
+    if reply is not None:
+        notice_id = _just_selected(reply)
+        if notice_id:
+            warm_notice_index(notice_id)
+        return reply
+
+    # ✅ 선택된 공고에 대한 Q&A (벡터검색 → LLM이 답변 생성)
+    results = _search_selected_notice(state)
+    if not results:
+        return _not_found(state)
+
+    key = _answer_key(state, results)
+    answer = _cached_answer(state, key)
+    if answer is None:
+        prompt = _build_notice_prompt(state, results)
+        answer = llm.invoke(_notice_messages(state, key, prompt))
         state["result"] = markdown.markdown(answer)
-        # state["result"] = answer + "\n\n👉 새로운 조건으로 검색하려면 'new', 대화를 종료하려면 'exit'를 입력해주세요."
-        return state
+        if key is not None:
+            notice_answer_cache.put(key, answer, state["result"], state["pages"])
+    _record_turn(state, answer, llm)
+    return state
+
+
+async def ahousing_agent(state, llm, on_token=None):
+    """
+    housing_agent 의 async 버전 - 블로킹 구간은 스레드 풀로, LLM 호출은 ainvoke 로 처리
+    on_token 이 주어지면 LLM 응답을 토큰 단위로 스트리밍
+    """
+    reply = _collect_user_data(state)
+    if reply is not None:
+        return reply
 
+    if not state.get("housing_recommended"):
+        return await run_blocking(_recommend_notices, state)
+
+    reply = _select_notice(state)
+    if reply is not None:
+        notice_id = _just_selected(reply)
+        if notice_id:
+            # 응답은 바로 돌려주고 색인은 백그라운드에서 생성 (첫 질문 전에 끝나도록)
+            task = asyncio.create_task(run_blocking(warm_notice_index, notice_id))
+            _warm_tasks.add(task)
+            task.add_done_callback(_warm_tasks.discard)
+        return reply
+
+    results = await run_blocking(_search_selected_notice, state)
+    if not results:
+        return _not_found(state)
+
+    key = _answer_key(state, results)
+    answer = _cached_answer(state, key)
+    if answer is not None:
+        if on_token is not None:
+            await on_token(answer)  # 캐시 답변은 한 번에 전송
+    else:
+        prompt = _build_notice_prompt(state, results)
+        answer = await astream_llm(llm, _notice_messages(state, key, prompt), on_token)
+        state["result"] = markdown.markdown(answer)
+        if key is not None:
+            notice_answer_cache.put(key, answer, state["result"], state["pages"])
+    _record_turn(state, answer, llm)
     return state
@@ -1,15 +1,176 @@
+import re
+import math
+import threading
+from collections import OrderedDict, Counter
 from langchain_core.prompts import PromptTemplate
 
-def intent_router(state, llm):
-    if "intent" in state and state["intent"]:
-        return state
+LABELS = ("loan", "housing")
 
-    prompt = PromptTemplate.from_template("""
-다음 사용자의 질문을 읽고 intent를 loan 또는 housing 중 하나로 출력하세요.
+INTENT_PROMPT = PromptTemplate.from_template("""
+아래 사용자의 질문을 읽고 intent를 'loan' 또는 'housing' 중 하나로 출력하세요.
 설명 없이 한 단어만 출력하세요.
 
 질문: {query}
 """)
-    chain = prompt | llm
-    intent = chain.invoke({"query": state["query"]}).strip().lower()
-    return {**state, "intent": intent}
+
+# ✅ 1단계: 키워드 - 한쪽 라벨 키워드만 나오면 바로 확정
+KEYWORDS = {
+    "loan": ["대출", "금리", "이자", "상환", "원리금", "원금", "한도", "융자", "빌리", "빌려",
+             "디딤돌", "버팀목", "보금자리론", "만기", "loan"],
+    "housing": ["주택", "청약", "임대", "공고", "아파트", "입주", "무주택", "행복주택", "국민임대",
+                "전세임대", "영구임대", "매입임대", "거주", "집", "housing"],
+}
+
+# ✅ 2단계: 문자 n-gram 나이브 베이즈 학습용 예시 문장
+SEED_EXAMPLES = {
+    "loan": [
+        "대출 받고 싶어요", "대출 상품 추천해줘", "돈을 빌리고 싶어", "3억 대출하면 이자 얼마야",
+        "주택담보대출 금리 비교", "전세자금대출 알려줘", "대출 상담", "월 상환액 계산해줘",
+        "금리 낮은 은행 알려줘", "원리금 균등 상환이 뭐야", "만기일시상환 총 비용", "대출 한도 알고 싶어",
+        "버팀목 대출 조건", "디딤돌 대출 가능해?", "신용대출 추천", "돈이 필요해요",
+    ],
+    "housing": [
+        "집 구하고 싶어", "임대주택 추천해줘", "청약 상담", "행복주택 신청하고 싶어",
+        "국민임대 공고 알려줘", "살 집 추천", "공공임대 자격 알려줘", "신혼부부 주택 추천",
+        "주거 상담 받고 싶어요", "아파트 청약 가능해?", "서울에 살 곳 찾아줘", "무주택자 임대 추천",
+        "LH 공고 보여줘", "전세임대 신청", "주택 추천", "주거 지원 받고 싶어",
+    ],
+}
+
+CONFIDENCE_THRESHOLD = 0.85
+CACHE_SIZE = 2048
+
+
+def normalize(text: str) -> str:
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _ngrams(text: str, n_values=(1, 2, 3)):
+    compact = text.replace(" ", "")
+    return [compact[i:i + n] for n in n_values for i in range(len(compact) - n + 1)]
+
+
+class _NgramNaiveBayes:
+    """문자 1~3-gram 나이브 베이즈 (라플라스 스무딩). 추론은 순수 파이썬으로 수십 µs"""
+
+    def __init__(self, examples: dict):
+        self.counts = {}
+        self.totals = {}
+        vocab = set()
+        for label, sentences in examples.items():
+            counter = Counter()
+            for s in sentences + KEYWORDS[label]:
+                counter.update(_ngrams(normalize(s)))
+            self.counts[label] = counter
+            self.totals[label] = sum(counter.values())
+            vocab.update(counter)
+        self.vocab_size = len(vocab)
+
+    def predict(self, text: str):
+        grams = _ngrams(text)
+        if not grams:
+            return None, 0.0
+        log_probs = {}
+        for label, counter in self.counts.items():
+            denom = self.totals[label] + self.vocab_size
+            log_probs[label] = sum(math.log((counter[g] + 1) / denom) for g in grams)
+        best = max(log_probs, key=log_probs.get)
+        # softmax 로 사후확률 근사
+        top = log_probs[best]
+        z = sum(math.exp(lp - top) for lp in log_probs.values())
+        return best, 1.0 / z
+
+
+class IntentClassifier:
+    """
+    계층형 intent 분류기: 캐시 → 키워드 → n-gram 모델 → (확신이 낮을 때만) LLM
+    - LLM 출력은 'loan'/'housing' 두 라벨로만 정규화
+    - 단계별 적중 수를 stats() 로 확인 (LLM 호출을 얼마나 줄였는지)
+    """
+
+    def __init__(self, threshold: float = CONFIDENCE_THRESHOLD, cache_size: int = CACHE_SIZE):
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self.model = _NgramNaiveBayes(SEED_EXAMPLES)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = Counter()
+
+    def _record(self, tier: str, key: str, label: str) -> str:
+        with self._lock:
+            self.hits[tier] += 1
+            if tier != "cache":
+                self._cache[key] = label
+                self._cache.move_to_end(key)
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return label
+
+    def _fast_path(self, key: str):
+        """LLM 없이 확정 가능하면 라벨, 아니면 None"""
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                label = self._cache[key]
+            else:
+                label = None
+        if label:
+            return self._record("cache", key, label)
+
+        matched = {l for l, words in KEYWORDS.items() if any(w in key for w in words)}
+        if len(matched) == 1:
+            return self._record("keyword", key, matched.pop())
+
+        label, confidence = self.model.predict(key)
+        if label and confidence >= self.threshold:
+            return self._record("ngram", key, label)
+        return None
+
+    def _parse_llm(self, output: str, key: str) -> str:
+        text = output.strip().lower()
+        found = [(text.find(l), l) for l in LABELS if l in text]
+        if found:
+            return min(found)[1]
+        if "대출" in text:
+            return "loan"
+        if "주택" in text or "청약" in text:
+            return "housing"
+        # 두 라벨 어디에도 해당하지 않으면 n-gram 모델의 추정으로 대체
+        return self.model.predict(key)[0] or "housing"
+
+    def classify(self, query: str, llm) -> str:
+        key = normalize(query)
+        label = self._fast_path(key)
+        if label:
+            return label
+        output = (INTENT_PROMPT | llm).invoke({"query": query})
+        return self._record("llm", key, self._parse_llm(output, key))
+
+    async def aclassify(self, query: str, llm) -> str:
+        key = normalize(query)
+        label = self._fast_path(key)
+        if label:
+            return label
+        output = await (INTENT_PROMPT | llm).ainvoke({"query": query})
+        return self._record("llm", key, self._parse_llm(output, key))
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self.hits.values())
+            return {
+                "total": total,
+                "by_tier": dict(self.hits),
+                "hit_rate": {t: round(c / total, 3) for t, c in self.hits.items()} if total else {},
+                "llm_calls_saved": total - self.hits["llm"],
+            }
+
+
+classifier = IntentClassifier()
+
+
+def intent_router(state, llm):
+    if "intent" in state and state["intent"]:
+        return state
+
+    return {**state, "intent": classifier.classify(state["query"], llm)}
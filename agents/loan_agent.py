@@ -1,9 +1,16 @@
 import re
 from utils.loan_calculator import get_table_text
 import markdown
+from utils.executor import run_blocking
+from utils.streaming import astream_llm
+from utils.history import HistoryManager
 
 DB_PATH = "/home/alpaco/lyj0622/project_real/data/loan_type.db"
 
+# ✅ 상품 표 설명 이후의 대화 기록: system + 표 프롬프트 + 표 설명(3개)은 고정, 나머지는 최근 턴 + 요약
+LOAN_PINNED = 3
+loan_memory = HistoryManager("loan_history", "loan_memory")
+
 def is_reset_command(text):
     triggers = ["new", "새로", "다시", "다른 조건"]
     text = text.lower()
@@ -15,7 +22,11 @@ def extract_number(text):
         return int(numbers[0])
     return None
 
-def loan_agent(state, llm):
+def _collect_loan_input(state):
+    """
+    종료/초기화 명령과 대출금액·기간 수집 단계.
+    이번 턴의 응답이 여기서 정해지면 그 상태를 반환하고, 다음 단계로 넘어가야 하면 None
+    """
     # ✅ NEW 명령 → intent 유지한 채 상태 초기화
     if is_reset_command(state["query"]):
         preserved_intent = state.get("intent")
@@ -63,10 +74,35 @@ def loan_agent(state, llm):
                 "result": "대출기간(년)을 입력해주세요."
             }
 
+    return None
+
+
+def _no_products(state):
+    return {
+        **state,
+        "result": "조건에 맞는 대출 상품이 없습니다. 다른 금액이나 기간으로 시도해 보세요.\n👉 새로운 조건으로 검색하려면 'new', 대화를 종료하려면 'exit'를 입력해주세요."
+    }
+
+
+def _build_table_prompt(state, table_text):
+    state["loan_table_text"] = table_text
+    return (
+        f"표 컬럼 설명: 은행명(bank), 상품명(product), 상환유형(repay_type), 평균금리(rate_avg_prev), 한도금액(limit_amt), 총 상환비용(cost_total)\n"
+        f"표의 내용을 참고해서 사용자에게 대출 가능한 상품에 대해 간결하고 가독성 좋게 설명해\n"
+        f"{table_text}"
+    )
+
+
+def loan_agent(state, llm):
+    reply = _collect_loan_input(state)
+    if reply is not None:
+        return reply
+
     if state.get("loan_table_text"):
-        state["loan_history"].append({"role": "user", "content": state["query"]})
-        response = llm.invoke(state["loan_history"])
-        state["loan_history"].append({"role": "assistant", "content": response})
+        loan_memory.append(state, "user", state["query"])
+        response = llm.invoke(loan_memory.messages(state, LOAN_PINNED))
+        loan_memory.append(state, "assistant", response)
+        loan_memory.compact(state, LOAN_PINNED, llm)
         state["result"] = response + "\n\n👉 새로운 조건으로 검색하려면 'new', 대화를 종료하려면 'exit'를 입력해주세요."
         return state
 
@@ -75,19 +111,41 @@ def loan_agent(state, llm):
     table_text = get_table_text(loan_amount, loan_years, DB_PATH)
     print("====table_text====:", table_text)
     if not table_text:
-        return {
-            **state,
-            "result": "조건에 맞는 대출 상품이 없습니다. 다른 금액이나 기간으로 시도해 보세요.\n👉 새로운 조건으로 검색하려면 'new', 대화를 종료하려면 'exit'를 입력해주세요."
-        }
+        return _no_products(state)
 
-    state["loan_tablet_text"] = table_text
-    prompt = (
-        f"표 컬럼 설명: 은행명(bank), 상품명(product), 상환유형(repay_type), 평균금리(rate_avg_prev), 한도금액(limit_amt), 총 상환비용(cost_total)\n"
-        f"표의 내용을 참고해서 사용자에게 대출 가능한 상품에 대해 간결하고 가독성 좋게 설명해\n"
-        f"{table_text}"
-    )
+    prompt = _build_table_prompt(state, table_text)
     state["loan_history"].append({"role": "user", "content": prompt})
     response = llm.invoke(state["loan_history"])
     state["loan_history"].append({"role": "assistant", "content": response})
     state["result"] = markdown.markdown(response + "\n\n👉 새로운 조건으로 검색하려면 'new', 대화를 종료하려면 'exit'를 입력해주세요.")
     return state
+
+
+async def aloan_agent(state, llm, on_token=None):
+    """
+    loan_agent 의 async 버전 - DB 조회는 스레드 풀로, LLM 호출은 ainvoke 로 처리
+    on_token 이 주어지면 LLM 응답을 토큰 단위로 스트리밍
+    """
+    reply = _collect_loan_input(state)
+    if reply is not None:
+        return reply
+
+    if state.get("loan_table_text"):
+        loan_memory.append(state, "user", state["query"])
+        response = await astream_llm(llm, loan_memory.messages(state, LOAN_PINNED), on_token)
+        loan_memory.append(state, "assistant", response)
+        loan_memory.compact(state, LOAN_PINNED, llm)
+        state["result"] = response + "\n\n👉 새로운 조건으로 검색하려면 'new', 대화를 종료하려면 'exit'를 입력해주세요."
+        return state
+
+    table_text = await run_blocking(get_table_text, state["loan_amount"], state["loan_year"], DB_PATH)
+    print("====table_text====:", table_text)
+    if not table_text:
+        return _no_products(state)
+
+    prompt = _build_table_prompt(state, table_text)
+    state["loan_history"].append({"role": "user", "content": prompt})
+    response = await astream_llm(llm, state["loan_history"], on_token)
+    state["loan_history"].append({"role": "assistant", "content": response})
+    state["result"] = markdown.markdown(response + "\n\n👉 새로운 조건으로 검색하려면 'new', 대화를 종료하려면 'exit'를 입력해주세요.")
+    return state
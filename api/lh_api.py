@@ -1,52 +1,144 @@
+import os
+import time
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import List, Dict, Optional
 
-BASE_URL_LIST = "http://apis.data.go.kr/B552555/lhLeaseNoticeInfo1/lhLeaseNoticeInfo1"
+LIVE_BASE_URL = "http://apis.data.go.kr/B552555/lhLeaseNoticeInfo1/lhLeaseNoticeInfo1"
 
-SERVICE_KEY = "7vXPD/NjWQN8i2+WYXCvpQVfowXrB8W1YFHf2mRHuvPSZxx2M+yYddqPSpZvo/a51IkboF0fJJnnKJOByy1F8Q=="
+# ✅ 오프라인 부하 테스트 시 로컬 대역 서버(api/lh_mock_server.py)로 전환
+#    예) LH_API_BASE_URL=http://127.0.0.1:8900/lhLeaseNoticeInfo1
+BASE_URL_LIST = os.getenv("LH_API_BASE_URL", LIVE_BASE_URL)
+
+SERVICE_KEY = os.getenv(
+    "LH_SERVICE_KEY",
+    "7vXPD/NjWQN8i2+WYXCvpQVfowXrB8W1YFHf2mRHuvPSZxx2M+yYddqPSpZvo/a51IkboF0fJJnnKJOByy1F8Q=="
+)
+
+PAGE_SIZE = 100
+CACHE_TTL = float(os.getenv("LH_CACHE_TTL", "300"))  # 공고 목록은 자주 안 바뀌므로 짧게 캐시 (초)
+TIMEOUT = (3, 10)  # (연결, 읽기) 초
+MAX_RETRIES = 3
+MAX_PAGE_WORKERS = 4
+
+
+class LHNoticeClient:
+    """
+    LH 임대 공고 목록 API 클라이언트
+    - Session + HTTPAdapter 로 커넥션을 재사용 (요청마다 새 TCP/TLS 연결 X)
+    - 연결 오류/429/5xx 는 지수 백오프로 재시도
+    - 첫 페이지의 전체 건수(ALL_CNT)를 보고 나머지 페이지를 동시에 가져옴
+    - (지역코드, 상위유형, 공고상태) 단위로 전체 목록을 짧게 캐시
+    """
+
+    def __init__(self, base_url: str = BASE_URL_LIST, service_key: str = SERVICE_KEY,
+                 cache_ttl: float = CACHE_TTL, page_size: int = PAGE_SIZE):
+        self.base_url = base_url
+        self.service_key = service_key
+        self.cache_ttl = cache_ttl
+        self.page_size = page_size
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=MAX_PAGE_WORKERS, thread_name_prefix="lh-api")
+
+        retry = Retry(
+            total=MAX_RETRIES,
+            backoff_factor=0.5,  # 0.5s, 1s, 2s ...
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _fetch_page(self, params: dict, page: int) -> Optional[List[Dict]]:
+        """한 페이지의 dsList 항목들 (실패 시 None)"""
+        try:
+            response = self.session.get(self.base_url, params={**params, "PAGE": str(page)}, timeout=TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            print(f"❗ 요청 에러 발생 (PAGE={page}): {e}")
+            return None
 
-def get_notices_by_house_ids(house_ids: List[str], region_code: Optional[str] = None) -> List[Dict]:
-    params = {
-        "serviceKey": SERVICE_KEY,
-        "PG_SZ": "100",
-        "PAGE": "1",
-        "UPP_AIS_TP_CD": "06",
-        "PAN_SS": "공고중",
-        "_type": "json"
-    }
-    if region_code:
-        params["CNP_CD"] = region_code
-
-    house_ids = list(set(map(str, house_ids)))
-    print(f"\n🎯 필터링할 house_ids: {house_ids}")
-
-    try:
-        response = requests.get(BASE_URL_LIST, params=params, timeout=10)
-        print(f"📡 응답 코드: {response.status_code}")
-        
         if response.status_code != 200:
-            print(f"❗ API 요청 실패: {response.status_code} {response.reason}")
+            print(f"❗ API 요청 실패 (PAGE={page}): {response.status_code} {response.reason}")
             print("🔍 응답 내용:\n", response.text)
-            return []
+            return None
 
         try:
             data = response.json()
         except ValueError:
             print("❗ JSON 파싱 실패! 응답 내용:\n", response.text)
-            return []
+            return None
 
-        result = []
+        items = []
         iterable = data.values() if isinstance(data, dict) else data
         for block in iterable:
             if isinstance(block, dict) and "dsList" in block:
-                for item in block["dsList"]:
-                    if str(item.get("AIS_TP_CD")) in house_ids:
-                        result.append({
-                            "PAN_ID": item.get("PAN_ID"),
-                            "PAN_NM": item.get("PAN_NM")
-                        })
-        return result
-
-    except requests.exceptions.RequestException as e:
-        print(f"❗ 요청 에러 발생: {e}")
-        return []
+                items.extend(block["dsList"] or [])
+        return items
+
+    def fetch_notices(self, region_code: Optional[str] = None, upp_ais_tp_cd: str = "06",
+                      pan_ss: str = "공고중") -> List[Dict]:
+        """조건에 맞는 전체 공고 목록 (모든 페이지, 캐시 사용)"""
+        key = (region_code, upp_ais_tp_cd, pan_ss)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] > now:
+                return cached[1]
+
+        params = {
+            "serviceKey": self.service_key,
+            "PG_SZ": str(self.page_size),
+            "UPP_AIS_TP_CD": upp_ais_tp_cd,
+            "PAN_SS": pan_ss,
+            "_type": "json"
+        }
+        if region_code:
+            params["CNP_CD"] = region_code
+
+        first = self._fetch_page(params, 1)
+        if first is None:
+            return []
+
+        items = list(first)
+        complete = True
+        total = int(first[0].get("ALL_CNT") or 0) if first else 0
+        if total > self.page_size:
+            last_page = (total + self.page_size - 1) // self.page_size
+            pages = list(self._pool.map(lambda p: self._fetch_page(params, p), range(2, last_page + 1)))
+            for page_items in pages:
+                if page_items is None:
+                    complete = False
+                    continue
+                items.extend(page_items)
+        print(f"📡 공고 {len(items)}건 수신 (ALL_CNT={total})")
+
+        # 일부 페이지가 실패한 결과는 캐시하지 않음
+        if complete:
+            with self._lock:
+                self._cache[key] = (now + self.cache_ttl, items)
+        return items
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_client = LHNoticeClient()
+
+
+def get_notices_by_house_ids(house_ids: List[str], region_code: Optional[str] = None) -> List[Dict]:
+    house_ids = set(map(str, house_ids))
+    print(f"\n🎯 필터링할 house_ids: {sorted(house_ids)}")
+
+    return [
+        {"PAN_ID": item.get("PAN_ID"), "PAN_NM": item.get("PAN_NM")}
+        for item in _client.fetch_notices(region_code)
+        if str(item.get("AIS_TP_CD")) in house_ids
+    ]
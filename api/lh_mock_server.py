@@ -0,0 +1,109 @@
+"""
+LH 임대 공고 API(lhLeaseNoticeInfo1) 로컬 대역 서버
+- 녹화된 응답(api/fixtures/lh_lease_notices.json)을 실제 API 와 같은 형식으로 재생
+- 지연(LH_MOCK_LATENCY_MS ± LH_MOCK_JITTER_MS)과 오류(LH_MOCK_ERROR_RATE, 503) 주입
+- 클라이언트는 LH_API_BASE_URL 로 이 서버를 가리키면 된다
+
+실행 (프로젝트 루트에서):
+    python -m api.lh_mock_server serve --port 8900
+    LH_API_BASE_URL=http://127.0.0.1:8900/lhLeaseNoticeInfo1 uvicorn main:app
+
+실제 API 응답 녹화:
+    python -m api.lh_mock_server record --regions 11 41 26 ""
+"""
+import os
+import json
+import random
+import asyncio
+import argparse
+from typing import Optional
+from fastapi import FastAPI, Response
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "lh_lease_notices.json")
+
+LATENCY_MS = float(os.getenv("LH_MOCK_LATENCY_MS", "150"))
+JITTER_MS = float(os.getenv("LH_MOCK_JITTER_MS", "50"))
+ERROR_RATE = float(os.getenv("LH_MOCK_ERROR_RATE", "0"))
+
+
+def load_fixtures(path: str = FIXTURE_PATH) -> dict:
+    """(CNP_CD, UPP_AIS_TP_CD, PAN_SS) → 공고 항목 리스트"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        (r["params"].get("CNP_CD") or None, r["params"]["UPP_AIS_TP_CD"], r["params"]["PAN_SS"]): r["items"]
+        for r in data["records"]
+    }
+
+
+def create_app(fixtures: dict, latency_ms: float = LATENCY_MS, jitter_ms: float = JITTER_MS,
+               error_rate: float = ERROR_RATE) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.get("/lhLeaseNoticeInfo1")
+    async def lh_lease_notice(PG_SZ: int = 10, PAGE: int = 1, UPP_AIS_TP_CD: str = "06",
+                              PAN_SS: str = "공고중", CNP_CD: Optional[str] = None):
+        app.state.requests += 1
+        delay = max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+
+        if random.random() < error_rate:
+            return Response(status_code=503, content="Service Unavailable (injected)")
+
+        items = fixtures.get((CNP_CD or None, UPP_AIS_TP_CD, PAN_SS), [])
+        start = (PAGE - 1) * PG_SZ
+        page_items = [
+            {**item, "ALL_CNT": str(len(items)), "RNUM": str(start + i + 1)}
+            for i, item in enumerate(items[start:start + PG_SZ])
+        ]
+        # 실제 API 와 같은 [{dsSch}, {dsList, resHeader}] 구조
+        return [
+            {"dsSch": [{"PG_SZ": str(PG_SZ), "PAGE": str(PAGE), "UPP_AIS_TP_CD": UPP_AIS_TP_CD,
+                        "PAN_SS": PAN_SS, "CNP_CD": CNP_CD or ""}]},
+            {"dsList": page_items, "resHeader": [{"RS_DTTM": "", "SS_CODE": "Y"}]}
+        ]
+
+    return app
+
+
+def record_fixtures(region_codes, path: str = FIXTURE_PATH, upp_ais_tp_cd: str = "06", pan_ss: str = "공고중"):
+    """실제 API 에서 지역별 전체 공고를 받아 fixture 파일로 저장"""
+    from api.lh_api import LHNoticeClient, LIVE_BASE_URL
+
+    client = LHNoticeClient(base_url=LIVE_BASE_URL, cache_ttl=0)
+    records = []
+    for code in region_codes:
+        items = client.fetch_notices(code or None, upp_ais_tp_cd, pan_ss)
+        items = [{k: v for k, v in item.items() if k not in ("ALL_CNT", "RNUM")} for item in items]
+        records.append({
+            "params": {"CNP_CD": code or None, "UPP_AIS_TP_CD": upp_ais_tp_cd, "PAN_SS": pan_ss},
+            "items": items
+        })
+        print(f"📼 CNP_CD={code or '-'}: {len(items)}건 녹화")
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"source": "lhLeaseNoticeInfo1", "records": records}, f, ensure_ascii=False, indent=1)
+    print(f"✅ 저장 완료: {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8900)
+    serve.add_argument("--fixtures", default=FIXTURE_PATH)
+
+    record = sub.add_parser("record")
+    record.add_argument("--regions", nargs="+", default=["11", "41", "26", ""],
+                        help="녹화할 CNP_CD 목록 (빈 문자열 = 지역 조건 없음)")
+    record.add_argument("--out", default=FIXTURE_PATH)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        import uvicorn
+        uvicorn.run(create_app(load_fixtures(args.fixtures)), host=args.host, port=args.port)
+    else:
+        record_fixtures(args.regions, args.out)
@@ -0,0 +1,83 @@
+"""
+질의 임베딩 지연 비교 (CPU): bge-m3 torch fp32 vs int8 동적 양자화 vs ONNX Runtime
+- 질의 1건씩 (캐시 없이) p50/p95 지연
+- 캐시 적중 지연
+- 동시 요청 묶기: N 스레드가 동시에 질의할 때 처리량
+- fp32 대비 코사인 유사도 (품질 변화 확인)
+
+실행 (프로젝트 루트에서):
+    python -m benchmarks.embedding_latency --backends torch int8 onnx --threads 8
+"""
+import json
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.notice_retrieval import FIXTURE_PATH, percentile
+from utils.embedding_service import EmbeddingService
+
+
+def measure_sequential(service, queries):
+    latencies = []
+    for q in queries:
+        service.clear_cache()
+        start = time.perf_counter()
+        service.embed_query(q)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def measure_concurrent(service, queries, threads):
+    service.clear_cache()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(service.embed_query, queries))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(FIXTURE_PATH, encoding="utf-8") as f:
+        queries = [q["question"] for q in json.load(f)] * args.repeat
+    unique = list(dict.fromkeys(queries))
+
+    reference = None
+    print(f"{'backend':<7} | {'load s':>6} | {'p50 ms':>7} | {'p95 ms':>7} | {'hit µs':>7} | "
+          f"{'q/s x' + str(args.threads):>8} | {'avg batch':>9} | {'cos vs fp32':>11}")
+    print("-" * 90)
+    for backend in args.backends:
+        service = EmbeddingService(device="cpu", backend=backend, max_wait_ms=5)
+        start = time.perf_counter()
+        service.model
+        load_s = time.perf_counter() - start
+        service.embed_query("워밍업")
+
+        latencies = measure_sequential(service, queries)
+
+        service.embed_query(unique[0])
+        start = time.perf_counter()
+        for _ in range(1000):
+            service.embed_query(unique[0])
+        hit_us = (time.perf_counter() - start) / 1000 * 1e6
+
+        service.batches = service.batched_items = 0
+        qps = measure_concurrent(service, unique * args.repeat, args.threads)
+        avg_batch = service.stats()["avg_batch_size"]
+
+        vectors = np.array(service.embed_documents(unique))
+        if reference is None and service.backend == "torch":
+            reference = vectors
+        cos = float(np.mean(np.sum(vectors * reference, axis=1))) if reference is not None else float("nan")
+
+        print(f"{service.backend:<7} | {load_s:>6.1f} | {percentile(latencies, 50):>7.1f} | "
+              f"{percentile(latencies, 95):>7.1f} | {hit_us:>7.1f} | {qps:>8.1f} | {avg_batch:>9.2f} | {cos:>11.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+LoRA 학습 처리량 비교: 패딩 방식별 (max_length = 기존 1024 고정 패딩, dynamic, packed)
+- 같은 학습 분할(fine_tuning.py 와 동일)로 --epochs 만큼 학습하고 epoch 당 소요 시간, 초당 토큰 수(패딩 제외)
+- 패딩 비율: 학습 DataLoader 를 한 바퀴 돌며 (배치 텐서 토큰 수 - 실제 토큰 수) / 배치 텐서 토큰 수
+- 체크포인트는 저장하지 않음
+
+실행 (프로젝트 루트에서):
+    python -m benchmarks.finetune_throughput --modes max_length dynamic packed --epochs 1
+"""
+import gc
+import json
+import argparse
+import tempfile
+import torch
+from transformers import AutoTokenizer
+
+from fine.data import prepare_datasets, count_tokens
+from fine.fine_tuning import MODEL_NAME, DATA_FILE, load_model, build_trainer, ThroughputCallback
+
+
+def padding_ratio(trainer) -> float:
+    total = real = 0
+    for batch in trainer.get_train_dataloader():
+        total += batch["input_ids"].numel()
+        real += int(batch["attention_mask"].sum()) if "attention_mask" in batch else batch["input_ids"].numel()
+    return (total - real) / total if total else 0.0
+
+
+def run_mode(mode: str, tokenizer, data_file: str, epochs: int, limit: int):
+    model, used = load_model(MODEL_NAME, mode)
+    train_data = prepare_datasets(data_file, tokenizer, used)["train"]
+    if limit:
+        train_data = train_data.select(range(min(limit, len(train_data))))
+    throughput = ThroughputCallback(count_tokens(train_data))
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        trainer = build_trainer(model, tokenizer, train_data, None, used, output_dir, callbacks=[throughput],
+                                num_train_epochs=epochs, save_strategy="no", logging_steps=50)
+        pad = padding_ratio(trainer)
+        result = trainer.train()
+
+    del trainer, model
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    return {
+        "mode": used, "rows": len(train_data), "padding_ratio": round(pad, 4),
+        "seconds_per_epoch": round(sum(e["seconds"] for e in throughput.epochs) / len(throughput.epochs), 2),
+        "tokens_per_s": round(sum(e["tokens_per_s"] for e in throughput.epochs) / len(throughput.epochs), 1),
+        "train_loss": round(result.training_loss, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", nargs="+", default=["max_length", "dynamic", "packed"])
+    parser.add_argument("--data-file", default=DATA_FILE)
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=0, help="학습 행 수 제한 (0 = 전체)")
+    parser.add_argument("--report", default=None)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=True)
+    results = [run_mode(mode, tokenizer, args.data_file, args.epochs, args.limit) for mode in args.modes]
+
+    print(f"{'mode':<10} | {'rows':>5} | {'pad %':>6} | {'s/epoch':>8} | {'tokens/s':>9} | {'loss':>6}")
+    print("-" * 58)
+    base = results[0]["seconds_per_epoch"]
+    for r in results:
+        print(f"{r['mode']:<10} | {r['rows']:>5} | {r['padding_ratio']:>6.1%} | {r['seconds_per_epoch']:>8.1f} | "
+              f"{r['tokens_per_s']:>9.0f} | {r['train_loss']:>6.3f}  (x{base / r['seconds_per_epoch']:.2f})")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"epochs": args.epochs, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"💾 리포트 저장: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+주택 추천 경로(LH 공고 조회) 오프라인 부하 테스트
+- 로컬 LH 대역 서버(api/lh_mock_server.py)를 같은 프로세스에서 띄우고
+  get_notices_by_house_ids 를 동시 클라이언트 수별로 호출해 처리량과 지연 분포를 측정
+- 네트워크 없이 실행 가능 (실제 data.go.kr 호출 없음)
+
+실행 (프로젝트 루트에서):
+    python -m benchmarks.housing_lh_load --requests 200 --latency-ms 150 --error-rate 0.05
+    python -m benchmarks.housing_lh_load --cache-ttl 300   # 응답 캐시 켠 상태
+"""
+import os
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+HOUSE_IDS = ["07", "08", "09", "10", "11", "13", "17"]
+REGIONS = ["11", "41", "26", None]
+
+
+def start_mock_server(port: int, latency_ms: float, error_rate: float):
+    import uvicorn
+    from api.lh_mock_server import create_app, load_fixtures
+
+    app = create_app(load_fixtures(), latency_ms=latency_ms, jitter_ms=latency_ms / 3, error_rate=error_rate)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return app, server
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--cache-ttl", type=float, default=0, help="LH 응답 캐시 TTL (0 = 끔)")
+    args = parser.parse_args()
+
+    # ✅ 클라이언트가 import 시점에 읽는 설정이므로 import 전에 지정
+    os.environ["LH_API_BASE_URL"] = f"http://127.0.0.1:{args.port}/lhLeaseNoticeInfo1"
+    os.environ["LH_CACHE_TTL"] = str(args.cache_ttl)
+    mock_app, server = start_mock_server(args.port, args.latency_ms, args.error_rate)
+
+    from api.lh_api import get_notices_by_house_ids
+
+    def one_request(_):
+        house_ids = random.sample(HOUSE_IDS, k=3)
+        region = random.choice(REGIONS)
+        start = time.perf_counter()
+        notices = get_notices_by_house_ids(house_ids, region)
+        return time.perf_counter() - start, len(notices)
+
+    print(f"{'clients':>8} | {'req/s':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'upstream':>8}")
+    print("-" * 64)
+    for clients in (1, 4, 16, 32):
+        before = mock_app.state.requests
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            results = list(pool.map(one_request, range(args.requests)))
+        elapsed = time.perf_counter() - start
+        latencies = [r[0] * 1000 for r in results]
+        print(
+            f"{clients:>8} | {args.requests / elapsed:>8.1f} | {percentile(latencies, 50):>8.1f} | "
+            f"{percentile(latencies, 95):>8.1f} | {percentile(latencies, 99):>8.1f} | "
+            f"{mock_app.state.requests - before:>8}"
+        )
+
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+대출 what-if 격자 계산 벤치마크
+- 금액 100개 × 기간 30개 × 전체 상품의 총 상환비용/첫 달 납입액/최저비용 상품 계산 시간
+- 상품 테이블 로드(최초 1회)는 제외하고 측정, JSON 직렬화 시간은 따로 표시
+
+실행 (프로젝트 루트에서):
+    python -m benchmarks.loan_grid --db data/loan_type.db
+"""
+import json
+import time
+import argparse
+import numpy as np
+
+from utils.loan_calculator import DB_PATH, compute_loan_grid, load_product_table
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--amounts", type=int, default=100)
+    parser.add_argument("--years", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    table = load_product_table(args.db)
+    amounts = np.linspace(10_000_000, 1_000_000_000, args.amounts).round(-6)
+    years = np.arange(1, args.years + 1)
+
+    compute_loan_grid(amounts, years, args.db)  # 워밍업
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        result = compute_loan_grid(amounts, years, args.db)
+    grid_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+    start = time.perf_counter()
+    payload = json.dumps(result, ensure_ascii=False)
+    json_ms = (time.perf_counter() - start) * 1000
+
+    cells = len(table) * args.amounts * args.years
+    print(f"📊 상품 {len(table)}개 × 금액 {args.amounts}개 × 기간 {args.years}개 = {cells:,} 셀")
+    print(f"⏱ 격자 계산: {grid_ms:.1f} ms  ({cells / grid_ms * 1000:,.0f} 셀/s)")
+    print(f"⏱ JSON 직렬화: {json_ms:.1f} ms, {len(payload) / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+공고 내 검색 품질/지연 비교: Chroma similarity_search (기존) vs dense / BM25 / hybrid(RRF) 공고별 색인
+- 질문 목록: benchmarks/fixtures/notice_questions.json
+- 정답 청크: 질문의 expected_terms 중 하나라도 포함한 청크 (공고에 해당 청크가 없으면 그 질문은 제외)
+- recall@k: 상위 k 개 안에 정답 청크가 하나라도 있는 질문 비율
+
+실행 (프로젝트 루트에서, ChromaDB 와 bge-m3 필요):
+    python -m benchmarks.notice_retrieval --notice-ids <PAN_ID> <PAN_ID>
+    python -m benchmarks.notice_retrieval --max-notices 20   # 컬렉션에서 앞 20개 공고
+"""
+import os
+import json
+import time
+import argparse
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "notice_questions.json")
+KS = [1, 3, 5]
+
+
+def _compact(text: str) -> str:
+    return "".join(text.split())
+
+
+def is_relevant(doc, expected_terms) -> bool:
+    content = _compact(doc.page_content)
+    return any(_compact(term) in content for term in expected_terms)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--notice-ids", nargs="*")
+    parser.add_argument("--max-notices", type=int, default=10)
+    parser.add_argument("--questions", default=FIXTURE_PATH)
+    args = parser.parse_args()
+
+    from utils import vectordb_search as vs
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions = json.load(f)
+
+    notice_ids = args.notice_ids
+    if not notice_ids:
+        metas = vs.get_vectordb().get(include=["metadatas"])["metadatas"]
+        notice_ids = sorted({m.get("notice_id") for m in metas if m and m.get("notice_id")})[:args.max_notices]
+
+    def chroma(query, notice_id, k):
+        return vs.get_vectordb().similarity_search(query, k=k, filter={"notice_id": notice_id})
+
+    def indexed(mode):
+        return lambda query, notice_id, k: vs.search_notice_in_vectordb(query, notice_id, top_k=k, mode=mode)
+
+    methods = {"chroma": chroma, "dense": indexed("dense"), "bm25": indexed("bm25"), "hybrid": indexed("hybrid")}
+    hits = {name: {k: 0 for k in KS} for name in methods}
+    latencies = {name: [] for name in methods}
+    build_ms = []
+    total = 0
+
+    for notice_id in notice_ids:
+        vs.invalidate_notice_index(notice_id)
+        start = time.perf_counter()
+        index = vs.get_notice_index(notice_id)
+        build_ms.append((time.perf_counter() - start) * 1000)
+
+        for q in questions:
+            if not any(is_relevant(doc, q["expected_terms"]) for doc in index.documents):
+                continue
+            total += 1
+            for name, search in methods.items():
+                start = time.perf_counter()
+                results = search(q["question"], notice_id, max(KS))
+                latencies[name].append((time.perf_counter() - start) * 1000)
+                for k in KS:
+                    if any(is_relevant(doc, q["expected_terms"]) for doc in results[:k]):
+                        hits[name][k] += 1
+
+    if not total:
+        print("❌ 정답 청크가 있는 질문이 없습니다. --notice-ids 를 확인해주세요.")
+        return
+
+    print(f"📄 공고 {len(notice_ids)}개, 평가 질문 {total}건, 색인 생성 평균 {sum(build_ms) / len(build_ms):.1f}ms")
+    header = " | ".join(f"recall@{k}" for k in KS)
+    print(f"{'method':<8} | {header} | {'p50 ms':>7} | {'p95 ms':>7}")
+    print("-" * (36 + len(header)))
+    for name in methods:
+        recalls = " | ".join(f"{hits[name][k] / total:>8.2f}" for k in KS)
+        print(f"{name:<8} | {recalls} | {percentile(latencies[name], 50):>7.1f} | {percentile(latencies[name], 95):>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
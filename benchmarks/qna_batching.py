@@ -0,0 +1,64 @@
+"""
+/qna 마이크로 배칭 처리량 벤치마크
+- 동시 클라이언트 1 / 4 / 16 명이 각각 질문을 연속으로 보낼 때 answers/sec 측정
+- 배칭 끔(max_batch_size=1) vs 배칭 켬 비교
+
+실행 (프로젝트 루트에서):
+    python -m benchmarks.qna_batching --requests 32 --max-new-tokens 64
+"""
+import argparse
+import asyncio
+import time
+
+from main import ask_clovax_batch
+from utils.batching import MicroBatcher
+
+QUESTIONS = [
+    "행복주택이 뭐야?",
+    "국민임대주택 신청 자격은?",
+    "통합공공임대가 뭐야?",
+    "전세임대 보증금은 얼마야?",
+    "무주택 세대구성원이란?",
+    "신혼부부 특별공급이 뭐야?",
+    "영구임대주택이란?",
+    "청약통장 납입 인정 회차가 뭐야?",
+]
+
+
+async def run_clients(batcher, clients: int, total: int):
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            await batcher.submit(QUESTIONS[i % len(QUESTIONS)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    batch_fn = lambda qs: ask_clovax_batch(qs, max_new_tokens=args.max_new_tokens)
+
+    # 🔥 워밍업
+    batch_fn(QUESTIONS[:1])
+
+    print(f"{'clients':>8} | {'mode':>10} | {'answers/s':>10} | {'avg batch':>9}")
+    print("-" * 48)
+    for clients in (1, 4, 16):
+        for mode, size in (("no-batch", 1), ("batched", args.max_batch_size)):
+            batcher = MicroBatcher(batch_fn, max_batch_size=size, max_wait_ms=args.max_wait_ms)
+            elapsed = await run_clients(batcher, clients, args.requests)
+            stats = batcher.stats()
+            print(f"{clients:>8} | {mode:>10} | {args.requests / elapsed:>10.2f} | {stats['avg_batch_size']:>9}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
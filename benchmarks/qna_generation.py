@@ -0,0 +1,131 @@
+"""
+/qna 모델 생성 속도/품질 비교 (CPU): LoRA 어댑터 vs 병합 가중치, bf16 vs fp32 vs int8 동적 양자화
+- 질문: fine/fine_data.json 의 검증 분할 (fine_tuning.py 와 같은 test_size=0.2, seed=42)
+- 변형(weights:dtype[:int8])마다 질문 1건씩 greedy 생성 → 지연 p50/p95, 생성 토큰/초
+- 품질: 정답(output) 대비 문자 bigram F1, 첫 변형 대비 답변 일치율
+- --report 를 주면 변형별 결과를 JSON 으로 저장 (배포별 모드 선택용)
+
+실행 (프로젝트 루트에서):
+    python -m benchmarks.qna_generation --variants adapter:bfloat16 merged:bfloat16 merged:float32 --questions 20
+    python -m benchmarks.qna_generation --variants merged:float32 merged:float32:int8 --threads 8 --report qna_cpu.json
+"""
+import json
+import time
+import argparse
+import torch
+from collections import Counter
+
+from benchmarks.notice_retrieval import percentile
+from utils.clovax_model import SYSTEM_MESSAGES, load_clovax
+
+DATA_PATH = "fine/fine_data.json"
+
+
+def load_validation_questions(path: str = DATA_PATH, limit: int = None):
+    """fine_tuning.py 와 같은 방식으로 분할한 검증셋 [(instruction, output), ...]"""
+    from datasets import Dataset
+
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    dataset = Dataset.from_list([{"instruction": r["instruction"], "output": r["output"]} for r in raw])
+    val = dataset.train_test_split(test_size=0.2, seed=42)["test"]
+    pairs = list(zip(val["instruction"], val["output"]))
+    return pairs[:limit] if limit else pairs
+
+
+def bigram_f1(prediction: str, reference: str) -> float:
+    """공백을 뺀 문자 bigram 기준 F1 (한국어 답변의 대략적인 내용 일치도)"""
+    def grams(text):
+        text = "".join(text.split())
+        return Counter(text[i:i + 2] for i in range(len(text) - 1))
+
+    pred, ref = grams(prediction), grams(reference)
+    overlap = sum((pred & ref).values())
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / sum(pred.values()), overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def generate(model, tokenizer, question: str, max_new_tokens: int):
+    """(답변, 생성 토큰 수)"""
+    prompt = tokenizer.apply_chat_template(
+        SYSTEM_MESSAGES + [{"role": "user", "content": question}], add_generation_prompt=True, tokenize=False
+    )
+    enc = tokenizer(prompt, return_tensors="pt", add_special_tokens=False).to(model.device)
+    with torch.no_grad():
+        output_ids = model.generate(
+            **enc, max_new_tokens=max_new_tokens, do_sample=False, repetition_penalty=1.2,
+            eos_token_id=tokenizer.eos_token_id, pad_token_id=tokenizer.pad_token_id
+        )
+    new_ids = output_ids[0][enc["input_ids"].shape[1]:]
+    answer = tokenizer.decode(new_ids, skip_special_tokens=False).split("<|")[0].strip()
+    return answer, len(new_ids)
+
+
+def run_variant(weights: str, dtype: str, quantize: str, questions, max_new_tokens: int, threads: int):
+    start = time.perf_counter()
+    # 병합본이 없으면 메모리에서만 병합 (QNA_MERGED_PATH 의 배포용 가중치는 만들거나 덮어쓰지 않음)
+    model, tokenizer, used = load_clovax(weights=weights, dtype=dtype, device_map="cpu",
+                                         quantize=quantize, threads=threads, save_merged=False)
+    load_s = time.perf_counter() - start
+
+    generate(model, tokenizer, "안녕하세요", 4)  # 워밍업
+    latencies, tokens, answers, f1 = [], 0, [], []
+    for question, gold in questions:
+        start = time.perf_counter()
+        answer, n = generate(model, tokenizer, question, max_new_tokens)
+        latencies.append(time.perf_counter() - start)
+        tokens += n
+        answers.append(answer)
+        f1.append(bigram_f1(answer, gold))
+    del model
+    return {"used": used, "load_s": load_s, "latencies": latencies, "tokens": tokens, "answers": answers,
+            "f1": sum(f1) / len(f1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variants", nargs="+", default=["adapter:bfloat16", "merged:bfloat16", "merged:float32"])
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--report", default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    questions = load_validation_questions(limit=args.questions)
+    print(f"📝 검증 질문 {len(questions)}건, max_new_tokens={args.max_new_tokens}, threads={torch.get_num_threads()}")
+
+    print(f"{'variant':<24} | {'load s':>6} | {'p50 s':>6} | {'p95 s':>6} | {'tok/s':>6} | "
+          f"{'gold F1':>7} | {'same as 1st':>11}")
+    print("-" * 86)
+    reference, report = None, []
+    for variant in args.variants:
+        weights, dtype, *rest = variant.split(":")
+        quantize = rest[0] if rest else "none"
+        result = run_variant(weights, dtype, quantize, questions, args.max_new_tokens, args.threads)
+        if reference is None:
+            reference = result["answers"]
+        same = sum(a == b for a, b in zip(result["answers"], reference)) / len(reference)
+        tok_s = result["tokens"] / sum(result["latencies"])
+        name = f"{result['used']}:{'float32' if quantize == 'int8' else dtype}"
+        print(f"{name:<24} | {result['load_s']:>6.1f} | {percentile(result['latencies'], 50):>6.2f} | "
+              f"{percentile(result['latencies'], 95):>6.2f} | {tok_s:>6.1f} | {result['f1']:>7.3f} | {same:>11.0%}")
+        report.append({
+            "variant": name, "load_s": round(result["load_s"], 2),
+            "p50_s": round(percentile(result["latencies"], 50), 3),
+            "p95_s": round(percentile(result["latencies"], 95), 3),
+            "tokens_per_s": round(tok_s, 2), "gold_f1": round(result["f1"], 4), "same_as_first": round(same, 4),
+        })
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"questions": len(questions), "max_new_tokens": args.max_new_tokens,
+                       "threads": torch.get_num_threads(), "variants": report}, f, ensure_ascii=False, indent=2)
+        print(f"💾 리포트 저장: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
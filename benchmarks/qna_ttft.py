@@ -0,0 +1,107 @@
+"""
+/qna time-to-first-token 비교: 매번 전체 프롬프트 prefill (기존) vs 시스템 프롬프트 KV 캐시 재사용
+- TTFT = max_new_tokens=1 generate 시간 (prefill + 첫 토큰)
+- 같은 질문의 greedy 답변(--check-tokens 개)이 두 방식에서 같은지 확인
+- 주의: 캐시는 배치 크기 1 에서만 적용된다. 부하가 걸려 MicroBatcher 가 여러 질문을 한 배치로 묶으면
+  왼쪽 패딩 때문에 전체 프롬프트를 다시 prefill 한다 → --concurrency 별로
+  (a) 배치 generate TTFT (서버가 실제로 하는 일, 캐시 미적용)  (b) 캐시를 쓰며 1건씩 순차 처리할 때 마지막 요청의 TTFT 를 비교
+- 요청마다 캐시를 deepcopy 하는 비용도 함께 출력
+
+실행 (프로젝트 루트에서):
+    python -m benchmarks.qna_ttft --questions 30 --device-map cpu --concurrency 1 4 8
+"""
+import copy
+import time
+import argparse
+
+from benchmarks.notice_retrieval import percentile
+from benchmarks.qna_generation import load_validation_questions
+from utils.clovax_model import SYSTEM_MESSAGES, load_clovax, PrefixKVCache, generate_with_prefix
+
+
+def encode(tokenizer, questions, device):
+    """질문 1건(str) 또는 여러 건(list, 왼쪽 패딩 배치)"""
+    prompts = [
+        tokenizer.apply_chat_template(
+            SYSTEM_MESSAGES + [{"role": "user", "content": q}], add_generation_prompt=True, tokenize=False
+        )
+        for q in ([questions] if isinstance(questions, str) else questions)
+    ]
+    return tokenizer(prompts, return_tensors="pt", padding=True, add_special_tokens=False).to(device)
+
+
+def run(model, tokenizer, prefix, enc, max_new_tokens):
+    return generate_with_prefix(
+        model, prefix, input_ids=enc["input_ids"], attention_mask=enc["attention_mask"],
+        max_new_tokens=max_new_tokens, do_sample=False, repetition_penalty=1.2,
+        eos_token_id=tokenizer.eos_token_id, pad_token_id=tokenizer.pad_token_id
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--device-map", default="auto")
+    parser.add_argument("--dtype", default="bfloat16")
+    parser.add_argument("--check-tokens", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    model, tokenizer, used = load_clovax(dtype=args.dtype, device_map=args.device_map, save_merged=False)
+    prefix = PrefixKVCache(model, tokenizer)
+    questions = [q for q, _ in load_validation_questions(limit=args.questions)]
+    encoded = [encode(tokenizer, q, model.device) for q in questions]
+
+    run(model, tokenizer, None, encoded[0], 1)  # 워밍업
+    run(model, tokenizer, prefix, encoded[0], 1)
+
+    results = {}
+    for name, cache in (("full prefill", None), ("prefix cache", prefix)):
+        latencies = []
+        for enc in encoded:
+            start = time.perf_counter()
+            run(model, tokenizer, cache, enc, 1)
+            latencies.append((time.perf_counter() - start) * 1000)
+        results[name] = latencies
+
+    same = sum(
+        run(model, tokenizer, None, enc, args.check_tokens).tolist() == run(model, tokenizer, prefix, enc, args.check_tokens).tolist()
+        for enc in encoded
+    )
+    avg_prompt = sum(enc["input_ids"].shape[1] for enc in encoded) / len(encoded)
+
+    print(f"🤖 {used}, 프롬프트 평균 {avg_prompt:.0f} 토큰 중 시스템 프롬프트 {len(prefix)} 토큰 캐시")
+    print(f"{'mode':<13} | {'TTFT p50 ms':>11} | {'TTFT p95 ms':>11}")
+    print("-" * 41)
+    for name, latencies in results.items():
+        print(f"{name:<13} | {percentile(latencies, 50):>11.1f} | {percentile(latencies, 95):>11.1f}")
+    print(f"✅ greedy {args.check_tokens} 토큰 답변 일치: {same}/{len(encoded)}")
+
+    start = time.perf_counter()
+    for _ in range(20):
+        copy.deepcopy(prefix.cache)
+    print(f"📋 요청당 캐시 deepcopy: {(time.perf_counter() - start) / 20 * 1000:.2f} ms")
+
+    # 동시 요청 c건: MicroBatcher 는 한 배치로 묶어 generate (캐시 미적용) vs 캐시를 쓰며 1건씩 순차 처리
+    print(f"\n{'concurrency':>11} | {'batched TTFT p50 ms':>19} | {'prefix serial last TTFT p50 ms':>30}")
+    print("-" * 67)
+    for c in args.concurrency:
+        groups = [questions[i:i + c] for i in range(0, len(questions) - c + 1, c)]
+        if not groups:
+            continue
+        batched, serial = [], []
+        for group in groups:
+            enc = encode(tokenizer, group, model.device)
+            start = time.perf_counter()
+            run(model, tokenizer, prefix, enc, 1)
+            batched.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            for q in group:
+                run(model, tokenizer, prefix, encode(tokenizer, q, model.device), 1)
+            serial.append((time.perf_counter() - start) * 1000)
+        print(f"{c:>11} | {percentile(batched, 50):>19.1f} | {percentile(serial, 50):>30.1f}")
+
+
+if __name__ == "__main__":
+    main()
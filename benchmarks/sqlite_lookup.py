@@ -0,0 +1,64 @@
+"""
+SQLite 조회 1건당 지연 비교: 매번 connect/close (기존) vs 공용 읽기 전용 커넥션 (utils/sqlite_pool)
+
+실행 (프로젝트 루트에서):
+    python -m benchmarks.sqlite_lookup --housing-db data/housing_type.db --loan-db data/loan_type.db
+"""
+import sqlite3
+import argparse
+import time
+
+from utils.db_access import DEFAULT_DB_PATH, build_housing_query
+from utils.loan_calculator import DB_PATH as LOAN_DB_PATH
+from utils.sqlite_pool import get_connection
+
+USER_STATE = {"계층": "일반", "무주택": True, "세대주": True, "총자산": 200000000,
+              "자동차가액": 30000000, "소득": 3000000, "가구원수": 2}
+REGION_SQL = "SELECT cnp_cd FROM region_code WHERE cnp_name LIKE ? LIMIT 1"
+LOAN_SQL = "SELECT bank, product, repay_type, rate_avg_prev, limit_amt FROM loan_products"
+
+
+def per_call_connect(db_path, sql, params):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def pooled(db_path, sql, params):
+    return get_connection(db_path).execute(sql, params).fetchall()
+
+
+def measure(fn, *args, repeat: int):
+    fn(*args)  # 워밍업
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--housing-db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--loan-db", default=LOAN_DB_PATH)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    housing_sql, housing_params = build_housing_query(USER_STATE)
+    cases = [
+        ("region_code LIKE", args.housing_db, REGION_SQL, ("%서울%",)),
+        ("housing search", args.housing_db, housing_sql, housing_params),
+        ("loan_products", args.loan_db, LOAN_SQL, ()),
+    ]
+
+    print(f"{'lookup':<18} | {'connect/call µs':>16} | {'pooled µs':>10} | {'speedup':>7}")
+    print("-" * 62)
+    for name, db_path, sql, params in cases:
+        before = measure(per_call_connect, db_path, sql, params, repeat=args.repeat)
+        after = measure(pooled, db_path, sql, params, repeat=args.repeat)
+        print(f"{name:<18} | {before:>16.1f} | {after:>10.1f} | {before / after:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+서버 기동 시간 측정: uvicorn 프로세스 시작 → 첫 요청(GET /) 응답까지, → /ready 200 까지
+- WARMUP_ON_STARTUP=1 (기본): 첫 요청은 바로, 모델은 백그라운드 로드 → /ready 까지 시간 = 전체 준비 시간
+- --no-startup-warmup: 완전 지연 로딩, 이후 POST /warmup 소요 시간 측정
+
+실행 (프로젝트 루트에서):
+    python -m benchmarks.startup_time
+    python -m benchmarks.startup_time --no-startup-warmup
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+import httpx
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, start: float, timeout: float, expect: int = 200):
+    while time.perf_counter() - start < timeout:
+        try:
+            if httpx.get(url, timeout=2).status_code == expect:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-startup-warmup", action="store_true")
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "WARMUP_ON_STARTUP": "0" if args.no_startup_warmup else "1"}
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"], env=env
+    )
+    try:
+        first = wait_for(f"{base}/", start, args.timeout)
+        if first is None:
+            print("❌ 서버가 응답하지 않습니다.")
+            return
+        print(f"🚀 첫 요청(GET /) 응답: {first:.1f}s")
+
+        if args.no_startup_warmup:
+            warm_start = time.perf_counter()
+            body = httpx.post(f"{base}/warmup", timeout=args.timeout).json()
+            print(f"🔥 POST /warmup: {time.perf_counter() - warm_start:.1f}s")
+        else:
+            ready = wait_for(f"{base}/ready", start, args.timeout)
+            print(f"✅ /ready 200: {ready:.1f}s" if ready else "❌ /ready 시간 초과")
+            body = httpx.get(f"{base}/ready", timeout=10).json()
+
+        for name, status in body["components"].items():
+            print(f"   - {name:<10} load {status['load_seconds']}s, warm {status['warm_seconds']}s"
+                  + (f" ❗ {status['error']}" if status["error"] else ""))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
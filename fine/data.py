@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import torch
+from utils.clovax_model import BASE_MODEL_PATH, SYSTEM_MESSAGES
+
+# ✅ LoRA 학습 데이터 준비
+#    - 프롬프트 + 답변을 한 번만 토큰화하고, offset 으로 프롬프트 구간을 찾아 labels 를 -100 으로 마스킹
+#    - 패딩 방식 (TRAIN_PADDING)
+#      max_length: 모든 예제를 MAX_LENGTH 까지 패딩 (기존 방식, 비교용)
+#      dynamic(기본): 배치 안에서 가장 긴 예제 길이까지만 패딩 + 길이가 비슷한 예제끼리 배치 (group_by_length)
+#      packed: 여러 예제를 MAX_LENGTH 한 줄로 이어 붙이고 position_ids 로 예제 경계를 표시
+#              (flash_attention_2 가 경계를 넘어 attend 하지 않음 → 패딩 토큰 0)
+#    - 전처리 결과는 (데이터 파일, 토크나이저, 프롬프트 템플릿, 설정) 해시별로 Arrow 데이터셋으로 저장해 두고 재사용
+#      입력은 JSON 배열 / JSONL 모두 가능. JSONL 은 블록 단위로 읽어 Arrow 로 변환하지만
+#      JSON 배열(fine/fine_data.json)은 datasets 가 파일 전체를 한 번에 읽음 → 큰 데이터는 JSONL 로 저장
+#      (변환 후에는 캐시된 Arrow 파일을 메모리 맵으로 읽음)
+MAX_LENGTH = 1024
+PADDING_MODES = ("max_length", "dynamic", "packed")
+PREP_CACHE_DIR = os.getenv("TRAIN_PREP_CACHE", "fine/cache")
+PREP_NUM_PROC = int(os.getenv("TRAIN_PREP_NUM_PROC", "0")) or os.cpu_count()
+PREP_VERSION = 1  # 토큰화/패킹 코드가 바뀌면 올려서 기존 캐시를 무효화
+
+
+def build_prompt(tokenizer, instruction: str) -> str:
+    return tokenizer.apply_chat_template(
+        SYSTEM_MESSAGES + [{"role": "user", "content": instruction}],
+        add_generation_prompt=True,
+        tokenize=False
+    )
+
+
+def tokenize_batch(batch, tokenizer, max_length: int = MAX_LENGTH):
+    """datasets.map(batched=True) 용: {instruction, output} → {input_ids, attention_mask, labels, length}"""
+    prompts = [build_prompt(tokenizer, instruction) for instruction in batch["instruction"]]
+    enc = tokenizer(
+        [prompt + output for prompt, output in zip(prompts, batch["output"])],
+        max_length=max_length,
+        truncation=True,
+        return_offsets_mapping=True
+    )
+
+    labels = []
+    for prompt, ids, offsets in zip(prompts, enc["input_ids"], enc["offset_mapping"]):
+        # 프롬프트 안에서 시작하는 토큰(특수 토큰 포함)은 학습하지 않음
+        boundary = len(prompt)
+        labels.append([-100 if start < boundary else token for token, (start, _) in zip(ids, offsets)])
+
+    return {
+        "input_ids": enc["input_ids"],
+        "attention_mask": enc["attention_mask"],
+        "labels": labels,
+        "length": [len(ids) for ids in enc["input_ids"]],
+    }
+
+
+def pack_batch(batch, max_length: int = MAX_LENGTH):
+    """
+    datasets.map(batched=True) 용: 토큰화된 예제를 순서대로 max_length 이하 행으로 묶음
+    position_ids 는 예제마다 0부터 다시 시작 (예제 경계)
+    """
+    packed = {"input_ids": [], "labels": [], "position_ids": [], "length": []}
+    input_ids, labels, position_ids = [], [], []
+
+    def flush():
+        if input_ids:
+            packed["input_ids"].append(list(input_ids))
+            packed["labels"].append(list(labels))
+            packed["position_ids"].append(list(position_ids))
+            packed["length"].append(len(input_ids))
+            input_ids.clear()
+            labels.clear()
+            position_ids.clear()
+
+    for ids, example_labels in zip(batch["input_ids"], batch["labels"]):
+        if len(input_ids) + len(ids) > max_length:
+            flush()
+        input_ids.extend(ids)
+        # 앞 예제의 마지막 토큰이 다음 예제 첫 토큰을 예측하지 않도록 경계 토큰은 항상 -100
+        labels.extend([-100] + example_labels[1:])
+        position_ids.extend(range(len(ids)))
+    flush()
+    return packed
+
+
+class PackedCollator:
+    """패킹된 행들을 (1, 총 길이) 한 줄로 이어 붙임. attention_mask 없이 position_ids 로 경계를 전달"""
+
+    def __call__(self, features):
+        input_ids, labels, position_ids = [], [], []
+        for f in features:
+            input_ids.extend(f["input_ids"])
+            labels.extend(f["labels"])
+            position_ids.extend(f["position_ids"])
+        return {
+            "input_ids": torch.tensor([input_ids]),
+            "labels": torch.tensor([labels]),
+            "position_ids": torch.tensor([position_ids]),
+        }
+
+
+def prepare_split(dataset, tokenizer, padding: str, max_length: int = MAX_LENGTH, num_proc: int = None):
+    """{instruction, output} 데이터셋 → 학습용 데이터셋 (packed 면 행 수가 줄어듦)"""
+    if padding not in PADDING_MODES:
+        raise ValueError(f"지원하지 않는 TRAIN_PADDING: {padding} ({', '.join(PADDING_MODES)})")
+    num_proc = num_proc if num_proc and len(dataset) >= num_proc * 100 else None  # 작은 데이터는 단일 프로세스가 더 빠름
+    tokenized = dataset.map(
+        tokenize_batch, batched=True, remove_columns=dataset.column_names, num_proc=num_proc,
+        fn_kwargs={"tokenizer": tokenizer, "max_length": max_length}, desc="토큰화"
+    )
+    if padding != "packed":
+        return tokenized
+    return tokenized.map(
+        pack_batch, batched=True, batch_size=1000, remove_columns=tokenized.column_names, num_proc=num_proc,
+        fn_kwargs={"max_length": max_length}, desc="패킹"
+    )
+
+
+def load_raw(data_file: str):
+    """JSON 배열 / JSONL → {instruction, output} 데이터셋 (JSONL 만 나눠 읽음, 배열은 통째로 로드)"""
+    from datasets import load_dataset
+    return load_dataset("json", data_files=data_file, split="train").select_columns(["instruction", "output"])
+
+
+def split_raw(dataset):
+    """검증셋은 benchmarks.qna_generation 과 같은 분할 (test_size=0.2, seed=42)"""
+    return dataset.train_test_split(test_size=0.2, seed=42)
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def tokenizer_digest(tokenizer) -> str:
+    """어휘/병합 규칙/정규화 설정(fast 토크나이저 직렬화) + chat template"""
+    h = hashlib.sha1()
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    h.update(backend.to_str().encode("utf-8") if backend is not None else tokenizer.name_or_path.encode("utf-8"))
+    h.update((tokenizer.chat_template or "").encode("utf-8"))
+    return h.hexdigest()
+
+
+def prep_key(data_file: str, tokenizer, padding: str, max_length: int = MAX_LENGTH) -> str:
+    h = hashlib.sha1()
+    h.update(file_digest(data_file).encode())
+    h.update(tokenizer_digest(tokenizer).encode())
+    h.update(build_prompt(tokenizer, "{instruction}").encode("utf-8"))  # 템플릿 + 시스템 메시지
+    h.update(f"{padding}:{max_length}:{PREP_VERSION}".encode())
+    return h.hexdigest()[:16]
+
+
+def prepare_datasets(data_file: str, tokenizer, padding: str, max_length: int = MAX_LENGTH,
+                     cache_dir: str = PREP_CACHE_DIR, num_proc: int = PREP_NUM_PROC):
+    """
+    DatasetDict(train, test). 같은 키로 전처리한 결과가 있으면 토큰화 없이 디스크에서 로드
+    (새로 만들면 임시 폴더에 저장 후 이름을 바꿔 중간에 중단돼도 깨진 캐시가 남지 않게 함)
+    """
+    from datasets import DatasetDict, load_from_disk
+
+    key = prep_key(data_file, tokenizer, padding, max_length)
+    path = os.path.join(cache_dir, f"{padding}-{key}")
+    if os.path.exists(os.path.join(path, "prep_info.json")):
+        print(f"📦 전처리 캐시 사용: {path}")
+        return load_from_disk(path)
+
+    start = time.perf_counter()
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")  # 여러 프로세스가 각자 토큰화
+    splits = split_raw(load_raw(data_file))
+    prepared = DatasetDict({
+        name: prepare_split(split, tokenizer, padding, max_length, num_proc) for name, split in splits.items()
+    })
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    prepared.save_to_disk(tmp_path)
+    with open(os.path.join(tmp_path, "prep_info.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "data_file": data_file,
+            "tokenizer": tokenizer.name_or_path,
+            "padding": padding,
+            "max_length": max_length,
+            "version": PREP_VERSION,
+            "rows": {name: len(ds) for name, ds in prepared.items()},
+            "tokens": {name: count_tokens(ds) for name, ds in prepared.items()},
+            "seconds": round(time.perf_counter() - start, 1),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }, f, ensure_ascii=False, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    print(f"💾 전처리 저장: {path} ({time.perf_counter() - start:.1f}s)")
+    return load_from_disk(path)
+
+
+def build_collator(tokenizer, padding: str, max_length: int = MAX_LENGTH):
+    """labels 는 -100 으로 패딩 (DataCollatorForLanguageModeling 처럼 labels 를 input_ids 로 덮어쓰지 않음)"""
+    from transformers import DataCollatorForSeq2Seq
+
+    if padding == "packed":
+        return PackedCollator()
+    if padding == "max_length":
+        return DataCollatorForSeq2Seq(tokenizer, padding="max_length", max_length=max_length, label_pad_token_id=-100)
+    return DataCollatorForSeq2Seq(tokenizer, padding=True, pad_to_multiple_of=8, label_pad_token_id=-100)
+
+
+def count_tokens(dataset) -> int:
+    """패딩을 뺀 실제 토큰 수 (한 epoch 에 학습하는 토큰 수)"""
+    return sum(dataset["length"])
+
+
+def main():
+    """학습 전에 전처리만 따로 실행 (예: CPU 노드에서 미리 만들어 두기)"""
+    from transformers import AutoTokenizer
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base_model", default=BASE_MODEL_PATH)
+    parser.add_argument("--data_file", default="fine/fine_data.json")
+    parser.add_argument("--padding", default=os.getenv("TRAIN_PADDING", "dynamic"), choices=PADDING_MODES)
+    parser.add_argument("--num_proc", type=int, default=PREP_NUM_PROC)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.base_model, use_fast=True)
+    prepared = prepare_datasets(args.data_file, tokenizer, args.padding, num_proc=args.num_proc)
+    for name, ds in prepared.items():
+        print(f"✅ {name}: {len(ds)}행, {count_tokens(ds)} 토큰")
+
+
+if __name__ == "__main__":
+    main()
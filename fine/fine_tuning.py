@@ -1,145 +1,271 @@
+import os
+import re
 import json
+import time
+import glob
+import shutil
+import argparse
+import resource
 import torch
-from datasets import Dataset
 from transformers import (
     AutoTokenizer, AutoModelForCausalLM,
-    TrainingArguments, Trainer,
-    DataCollatorForLanguageModeling
+    TrainingArguments, Trainer, TrainerCallback, EarlyStoppingCallback
 )
+from transformers.trainer_utils import PREFIX_CHECKPOINT_DIR
 from peft import get_peft_model, LoraConfig, TaskType
+from fine.data import MAX_LENGTH, PADDING_MODES, PREP_NUM_PROC, prepare_datasets, build_collator, count_tokens
 
-# ✅ 모델명 및 경로
-model_name = "naver-hyperclovax/HyperCLOVAX-SEED-Text-Instruct-1.5B"
-output_dir = "/home/alpaco/lcmtest/naver/finetuned_hyperclovax30"
+# 실행 (프로젝트 루트에서):
+#     python -m fine.fine_tuning --data_file fine/fine_data.json --output_dir fine/finetuned_hyperclovax30
+#     TRAIN_PADDING=packed python -m fine.fine_tuning ...   # 패딩 방식: max_length | dynamic(기본) | packed
+#     전처리는 fine/data.py 가 해시별로 캐시 → 데이터/토크나이저/템플릿이 그대로면 바로 학습 시작
+#     epoch 마다 검증 → TRAIN_PATIENCE 번 연속 개선이 없으면 조기 종료, 검증 손실 기준 상위 TRAIN_KEEP_BEST 개 체크포인트만 유지
+#     학습이 끝나면 output_dir/training_report.json 에 손실 곡선, epoch 별 시간/메모리 기록
 
-# ✅ 토크나이저 / 모델 로드
-tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
-model = AutoModelForCausalLM.from_pretrained(
-    model_name,
-    device_map="auto",
-    torch_dtype=torch.bfloat16
-)
+# ✅ 모델명 및 경로 (기본값)
+MODEL_NAME = "naver-hyperclovax/HyperCLOVAX-SEED-Text-Instruct-1.5B"
+OUTPUT_DIR = "/home/alpaco/lcmtest/naver/finetuned_hyperclovax30"
+DATA_FILE = "fine/fine_data.json"
+TRAIN_PADDING = os.getenv("TRAIN_PADDING", "dynamic")
+TRAIN_EPOCHS = int(os.getenv("TRAIN_EPOCHS", "30"))           # 최대 epoch (조기 종료 가능)
+TRAIN_PATIENCE = int(os.getenv("TRAIN_PATIENCE", "3"))        # 검증 손실이 개선되지 않아도 기다리는 epoch 수
+TRAIN_MIN_DELTA = float(os.getenv("TRAIN_MIN_DELTA", "0.0"))  # 이만큼 이상 줄어야 개선으로 인정
+TRAIN_KEEP_BEST = int(os.getenv("TRAIN_KEEP_BEST", "2"))      # 남겨둘 체크포인트 수 (검증 손실 기준)
+REPORT_FILE = "training_report.json"
 
-# ✅ PEFT (LoRA) 설정
-peft_config = LoraConfig(
-    task_type=TaskType.CAUSAL_LM,
-    inference_mode=False,
-    r=8,
-    lora_alpha=16,
-    lora_dropout=0.05,
-    bias="none"
-)
-model = get_peft_model(model, peft_config)
-
-# ✅ 데이터 로드
-with open("/home/alpaco/welhome/PEFT/fine_data.json", encoding="utf-8") as f:
-    raw_data = json.load(f)
-
-dataset = Dataset.from_list([
-    {"instruction": item["instruction"], "output": item["output"]}
-    for item in raw_data
-])
-
-# ✅ 전처리 함수
-def preprocess(example):
-    prompt_text = tokenizer.apply_chat_template(
-        [
-            {"role": "tool_list", "content": ""},
-            {"role": "system", "content": "- AI 언어모델의 이름은 \"CLOVA X\" 이며 네이버에서 만들었다.\n- 오늘은 2025년 04월 24일(목)이다."},
-            {"role": "user", "content": example["instruction"]}
-        ],
-        add_generation_prompt=True,
-        tokenize=False
-    )
-    full_text = prompt_text + example["output"]
-
-    tokenized = tokenizer(
-        full_text,
-        return_tensors="pt",
-        max_length=1024,
-        truncation=True,
-        padding="max_length"
+
+def load_model(model_name: str, padding: str):
+    """
+    (LoRA 모델, 실제 사용한 패딩 방식)
+    packed 는 flash_attention_2 가 있어야 예제 경계가 지켜지므로, 없으면 dynamic 으로 대체
+    """
+    kwargs = {"device_map": "auto", "torch_dtype": torch.bfloat16}
+    model = None
+    if padding == "packed":
+        try:
+            model = AutoModelForCausalLM.from_pretrained(model_name, attn_implementation="flash_attention_2", **kwargs)
+        except (ImportError, ValueError) as e:
+            print(f"⚠️ flash_attention_2 사용 불가, dynamic 패딩으로 대체: {e}")
+            padding = "dynamic"
+    if model is None:
+        model = AutoModelForCausalLM.from_pretrained(model_name, **kwargs)
+
+    # ✅ PEFT (LoRA) 설정
+    peft_config = LoraConfig(
+        task_type=TaskType.CAUSAL_LM,
+        inference_mode=False,
+        r=8,
+        lora_alpha=16,
+        lora_dropout=0.05,
+        bias="none"
     )
+    return get_peft_model(model, peft_config), padding
 
-    input_ids = tokenized["input_ids"][0]
-    attention_mask = tokenized["attention_mask"][0]
-    labels = input_ids.clone()
 
-    prompt_len = len(tokenizer(prompt_text, return_tensors="pt")["input_ids"][0])
-    labels[:prompt_len] = -100
+def print_debug_samples(train_data, tokenizer, n: int = 2):
+    print("\n🧪 [DEBUG SAMPLE 2개]")
+    for i in range(n):
+        sample = train_data[i]
+        decoded_input = tokenizer.decode(sample["input_ids"], skip_special_tokens=False)
+        decoded_label = tokenizer.decode(
+            [id if id != -100 else tokenizer.pad_token_id for id in sample["labels"]],
+            skip_special_tokens=False
+        )
+        prompt_len = sample["labels"].index(
+            next(label for label in sample["labels"] if label != -100)
+        )
 
-    return {
-        "input_ids": input_ids.tolist(),
-        "attention_mask": attention_mask.tolist(),
-        "labels": labels.tolist()
-    }
+        print(f"\n🔹 [Sample {i+1}]")
+        print(f"🔸 length      : {sample['length']}")
+        print(f"🔸 prompt_len  : {prompt_len}")
+        print(f"🔸 input_ids[:30]: {sample['input_ids'][:30]}")
+        print(f"🔸 labels[:30]   : {sample['labels'][:30]}")
+        print(f"🔸 decoded_input:\n{decoded_input}")
+        print(f"🔸 decoded_label:\n{decoded_label}")
+
+
+def peak_memory_mb() -> float:
+    """GPU 면 이번 epoch 최대 할당량, CPU 면 프로세스 최대 RSS"""
+    if torch.cuda.is_available():
+        return torch.cuda.max_memory_allocated() / 2**20
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ThroughputCallback(TrainerCallback):
+    """epoch 마다 소요 시간, 초당 학습 토큰 수(패딩 제외), 최대 메모리 기록"""
+
+    def __init__(self, tokens_per_epoch: int):
+        self.tokens_per_epoch = tokens_per_epoch
+        self.epochs = []
+        self._start = None
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        seconds = time.perf_counter() - self._start
+        self.epochs.append({
+            "epoch": round(state.epoch),
+            "seconds": round(seconds, 2),
+            "tokens_per_s": round(self.tokens_per_epoch / seconds, 1),
+            "peak_memory_mb": round(peak_memory_mb(), 1),
+        })
+        print(f"⏱ epoch {round(state.epoch)}: {seconds:.1f}s, {self.tokens_per_epoch / seconds:.0f} tokens/s")
+
+
+def _checkpoint_step(path: str) -> int:
+    return int(re.search(rf"{PREFIX_CHECKPOINT_DIR}-(\d+)$", path).group(1))
+
+
+class KeepBestCheckpoints(TrainerCallback):
+    """
+    저장할 때마다 검증 손실이 낮은 keep 개 체크포인트만 남기고 삭제
+    (save_total_limit 은 최근 체크포인트 기준이라 사용하지 않음)
+    """
+
+    def __init__(self, keep: int = TRAIN_KEEP_BEST):
+        self.keep = keep
+
+    def on_save(self, args, state, control, **kwargs):
+        if not state.is_world_process_zero:
+            return
+        losses = {e["step"]: e["eval_loss"] for e in state.log_history if "eval_loss" in e}
+        checkpoints = glob.glob(os.path.join(args.output_dir, f"{PREFIX_CHECKPOINT_DIR}-*"))
+        ranked = sorted(checkpoints, key=lambda path: losses.get(_checkpoint_step(path), float("inf")))
+        for path in ranked[self.keep:]:
+            if path != state.best_model_checkpoint:
+                shutil.rmtree(path, ignore_errors=True)
 
-# ✅ 데이터 분할
-dataset_split = dataset.train_test_split(test_size=0.2, seed=42)
-train_data = dataset_split["train"].map(preprocess)
-val_data = dataset_split["test"].map(preprocess)
-
-# ✅ 디버깅용 샘플 출력
-print("\n🧪 [DEBUG SAMPLE 2개]")
-for i in range(2):
-    sample = train_data[i]
-    decoded_input = tokenizer.decode(sample["input_ids"], skip_special_tokens=False)
-    decoded_label = tokenizer.decode(
-        [id if id != -100 else tokenizer.pad_token_id for id in sample["labels"]],
-        skip_special_tokens=False
+
+def build_trainer(model, tokenizer, train_data, val_data, padding: str, output_dir: str,
+                  callbacks=(), **overrides):
+    # ✅ 학습 설정
+    args = dict(
+        output_dir=output_dir,
+        per_device_train_batch_size=2,
+        gradient_accumulation_steps=4,
+        num_train_epochs=TRAIN_EPOCHS,
+        learning_rate=5e-5,
+        logging_dir="./logs",
+        logging_steps=10,
+        save_strategy="epoch",
+        # epoch 마다 검증, 끝나면 검증 손실이 가장 낮았던 체크포인트를 다시 로드
+        eval_strategy="epoch" if val_data is not None else "no",
+        load_best_model_at_end=val_data is not None,
+        metric_for_best_model="eval_loss",
+        greater_is_better=False,
+        bf16=True,
+        report_to="none",
+        # 길이가 비슷한 예제끼리 배치 → 배치 안 패딩 최소화
+        group_by_length=padding == "dynamic",
+        length_column_name="length",
     )
-    prompt_len = sample["labels"].index(
-        next(label for label in sample["labels"] if label != -100)
+    args.update(overrides)
+
+    return Trainer(
+        model=model,
+        args=TrainingArguments(**args),
+        train_dataset=train_data,
+        eval_dataset=val_data,
+        tokenizer=tokenizer,
+        data_collator=build_collator(tokenizer, padding),
+        callbacks=list(callbacks)
     )
 
-    print(f"\n🔹 [Sample {i+1}]")
-    print(f"🔸 instruction : {dataset_split['train'][i]['instruction']}")
-    print(f"🔸 output      : {dataset_split['train'][i]['output']}")
-    print(f"🔸 prompt_len  : {prompt_len}")
-    print(f"🔸 input_ids[:30]: {sample['input_ids'][:30]}")
-    print(f"🔸 labels[:30]   : {sample['labels'][:30]}")
-    print(f"🔸 decoded_input:\n{decoded_input}")
-    print(f"🔸 decoded_label:\n{decoded_label}")
-
-# ✅ 데이터 콜레이터
-collator = DataCollatorForLanguageModeling(tokenizer=tokenizer, mlm=False)
-
-# ✅ 학습 설정
-training_args = TrainingArguments(
-    output_dir=output_dir,
-    per_device_train_batch_size=2,
-    gradient_accumulation_steps=4,
-    num_train_epochs=30,
-    learning_rate=5e-5,
-    logging_dir="./logs",
-    logging_steps=10,
-    save_strategy="epoch",
-    bf16=True,
-    report_to="none"
-)
 
-# ✅ Trainer 구성
-trainer = Trainer(
-    model=model,
-    args=training_args,
-    train_dataset=train_data,
-    eval_dataset=val_data,
-    tokenizer=tokenizer,
-    data_collator=collator
-)
+def write_training_report(trainer, throughput: ThroughputCallback, log_history: list, output_dir: str,
+                          final_metrics: dict, max_epochs: int) -> str:
+    """
+    손실 곡선(train/eval), epoch 별 시간·메모리, 조기 종료 여부를 output_dir 에 JSON 으로 저장
+    log_history 는 trainer.train() 직후의 스냅샷 (학습 후 evaluate() 는 복원된 best 모델 기준이라
+    마지막 epoch 의 검증 손실을 덮어쓰지 않도록 곡선에서 제외하고 final_metrics 로 따로 기록)
+    """
+    state = trainer.state
+    eval_loss = {
+        round(e["epoch"]): e["eval_loss"]
+        for e in log_history if "eval_loss" in e and e["step"] <= state.global_step
+    }
+    epochs = [{**e, "eval_loss": eval_loss.get(e["epoch"])} for e in throughput.epochs]
+    best_epoch = min(eval_loss, key=eval_loss.get) if eval_loss else None
+
+    report = {
+        "epochs_run": len(epochs),
+        "max_epochs": max_epochs,
+        "stopped_early": len(epochs) < max_epochs,
+        "best_epoch": best_epoch,
+        "best_eval_loss": eval_loss.get(best_epoch),
+        "best_checkpoint": state.best_model_checkpoint,
+        "final_metrics": final_metrics,
+        "total_seconds": round(sum(e["seconds"] for e in epochs), 1),
+        "peak_memory_mb": max((e["peak_memory_mb"] for e in epochs), default=None),
+        "epochs": epochs,
+        "train_loss_curve": [
+            {"step": e["step"], "epoch": round(e["epoch"], 2), "loss": e["loss"]}
+            for e in log_history if "loss" in e
+        ],
+    }
+    path = os.path.join(output_dir, REPORT_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base_model", default=MODEL_NAME)
+    parser.add_argument("--data_file", default=DATA_FILE)
+    parser.add_argument("--output_dir", default=OUTPUT_DIR)
+    parser.add_argument("--padding", default=TRAIN_PADDING, choices=PADDING_MODES)
+    parser.add_argument("--num_proc", type=int, default=PREP_NUM_PROC)
+    parser.add_argument("--epochs", type=int, default=TRAIN_EPOCHS)
+    parser.add_argument("--patience", type=int, default=TRAIN_PATIENCE)
+    parser.add_argument("--min_delta", type=float, default=TRAIN_MIN_DELTA)
+    parser.add_argument("--keep_best", type=int, default=TRAIN_KEEP_BEST)
+    args = parser.parse_args()
+
+    # ✅ 토크나이저 / 모델 로드
+    tokenizer = AutoTokenizer.from_pretrained(args.base_model, use_fast=True)
+    model, padding = load_model(args.base_model, args.padding)
+
+    # ✅ 데이터 로드 + 전처리 (캐시가 있으면 그대로 로드)
+    prepared = prepare_datasets(args.data_file, tokenizer, padding, num_proc=args.num_proc)
+    train_data, val_data = prepared["train"], prepared["test"]
+    tokens_per_epoch = count_tokens(train_data)
+    print(f"📝 학습 {len(train_data)}행 ({padding}, 최대 {MAX_LENGTH} 토큰), epoch 당 {tokens_per_epoch} 토큰")
+
+    print_debug_samples(train_data, tokenizer)
+
+    throughput = ThroughputCallback(tokens_per_epoch)
+    callbacks = [
+        throughput,
+        EarlyStoppingCallback(early_stopping_patience=args.patience, early_stopping_threshold=args.min_delta),
+        KeepBestCheckpoints(args.keep_best),
+    ]
+    trainer = build_trainer(model, tokenizer, train_data, val_data, padding, args.output_dir,
+                            callbacks=callbacks, num_train_epochs=args.epochs)
+
+    # ✅ 학습 시작
+    print("\n🚀 학습 시작")
+    trainer.train()
+    log_history = list(trainer.state.log_history)  # epoch 별 검증 손실 (최종 evaluate 이전)
+
+    # ✅ 최종 평가 (가장 좋았던 체크포인트 기준)
+    print("\n🧪 최종 검증:")
+    metrics = trainer.evaluate()
+    print(metrics)
+
+    # ✅ 모델 저장
+    print("\n✅ 학습 완료 - 모델 저장 중...")
+    model.save_pretrained(args.output_dir)
+    tokenizer.save_pretrained(args.output_dir)
+    model.config.save_pretrained(args.output_dir)
+    print(f"✅ 저장 완료: {args.output_dir}")
+
+    report_path = write_training_report(trainer, throughput, log_history, args.output_dir, metrics, args.epochs)
+    print(f"📈 학습 리포트: {report_path}")
+
 
-# ✅ 학습 시작
-print("\n🚀 학습 시작")
-trainer.train()
-
-# ✅ 최종 평가
-print("\n🧪 최종 검증:")
-metrics = trainer.evaluate()
-print(metrics)
-
-# ✅ 모델 저장
-print("\n✅ 학습 완료 - 모델 저장 중...")
-model.save_pretrained(output_dir)
-tokenizer.save_pretrained(output_dir)
-model.config.save_pretrained(output_dir)
-print(f"✅ 저장 완료: {output_dir}")
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,21 @@
-import torch
 from transformers import AutoModelForCausalLM
-from peft import PeftModel
+from utils.clovax_model import BASE_MODEL_PATH, ADAPTER_PATH, MERGED_PATH, DTYPES, build_merged_weights
 
-# 경로 설정
-base_model_path = "naver-hyperclovax/HyperCLOVAX-SEED-Text-Instruct-1.5B"  # 원본 모델
-adapter_path = "/home/alpaco/test/fine/finetuned_hyperclovax30"            # LoRA 어댑터 경로
-merged_output_path = "/home/alpaco/test/fine/merged_model"                 # 병합 결과 저장 경로
+# 경로 설정 (환경변수 BASE_MODEL / LORA_ADAPTER / QNA_MERGED_PATH 로 변경 가능)
+# 실행 (프로젝트 루트에서): python -m fine.model
+# → 서버(QNA_WEIGHTS=auto)는 여기서 만든 병합 가중치를 그대로 로드한다
+base_model_path = BASE_MODEL_PATH     # 원본 모델
+adapter_path = ADAPTER_PATH           # LoRA 어댑터 경로
+merged_output_path = MERGED_PATH      # 병합 결과 저장 경로
 
 # 1. 원본 모델 로드
 base_model = AutoModelForCausalLM.from_pretrained(
     base_model_path,
-    torch_dtype=torch.bfloat16,
+    torch_dtype=DTYPES["bfloat16"],
     device_map="auto"
 )
 
-# 2. LoRA 어댑터 로드 및 병합
+# 2. LoRA 어댑터 로드 및 병합 + 3. 병합된 모델 저장 (merge_info.json 포함)
 print("🚀 LoRA 어댑터 병합 중...")
-lora_model = PeftModel.from_pretrained(base_model, adapter_path)
-merged_model = lora_model.merge_and_unload()
-
-# 3. 병합된 모델 저장
-merged_model.save_pretrained(merged_output_path)
+merged_model = build_merged_weights(base_model, adapter_path, merged_output_path)
 print(f"✅ 병합된 모델 저장 완료: {merged_output_path}")
@@ -1,7 +1,9 @@
-from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
-from agents.loan_agent import loan_agent
-from agents.housing_agent import housing_agent
+from agents.loan_agent import loan_agent, aloan_agent
+from agents.housing_agent import housing_agent, ahousing_agent
+from agents.intent_router import classifier as intent_classifier
+from utils.lazy import register
 
 from typing import TypedDict
 
@@ -13,7 +15,9 @@ class AgentState(TypedDict, total=False):
     loan_year: int
     loan_table_text: str
     loan_history: list
+    loan_memory: dict
     housing_history: list
+    housing_memory: dict
     housing_user_data: dict
     housing_notices: list
     housing_selected_notice: dict
@@ -23,33 +27,57 @@ class AgentState(TypedDict, total=False):
     pages_flag: bool
     result: str
 
-from langchain_ollama import OllamaLLM
-llm = OllamaLLM(model="exaone3.5:7.8b")
+# ✅ 에이전트 LLM 클라이언트는 첫 사용 때 생성 (워밍업: 토큰 1개 생성으로 Ollama 에 모델 적재)
+AGENT_MODEL = "exaone3.5:7.8b"
 
 
+def _load_agent_llm():
+    from langchain_ollama import OllamaLLM
+    return OllamaLLM(model=AGENT_MODEL)
+
+
+agent_llm = register("agent_llm", _load_agent_llm, warm=lambda llm: llm.invoke("안녕", options={"num_predict": 1}))
+
+
+# ✅ 키워드/n-gram/캐시로 확실한 경우는 바로 분류하고, 애매할 때만 LLM 호출
 def intent_router(state: AgentState):
     if state.get("intent"):
         return state
 
-    prompt = PromptTemplate.from_template("""
-아래 사용자의 질문을 읽고 intent를 'loan' 또는 'housing' 중 하나로 출력하세요.
-설명 없이 한 단어만 출력하세요.
+    state["intent"] = intent_classifier.classify(state["query"], agent_llm.get())
+    return state
+
 
-질문: {query}
-""")
-    chain = prompt | llm
-    intent = chain.invoke({"query": state["query"]}).strip().lower()
-    state["intent"] = intent
+async def aintent_router(state: AgentState):
+    if state.get("intent"):
+        return state
+
+    state["intent"] = await intent_classifier.aclassify(state["query"], agent_llm.get())
     return state
 
 
+# ✅ 스트리밍: ainvoke 시 config={"configurable": {"on_token": async_callback}} 를 넘기면
+#    에이전트의 LLM 응답이 토큰 단위로 콜백에 전달된다
+def _on_token(config):
+    return (config or {}).get("configurable", {}).get("on_token")
+
+
+async def _aloan_node(state: AgentState, config):
+    return await aloan_agent(state, agent_llm.get(), on_token=_on_token(config))
+
+
+async def _ahousing_node(state: AgentState, config):
+    return await ahousing_agent(state, agent_llm.get(), on_token=_on_token(config))
+
+
 graph = StateGraph(AgentState)
 
 # 주택 대출
 
-graph.add_node("intent_router", intent_router)
-graph.add_node("loan_agent", lambda state: loan_agent(state, llm))
-graph.add_node("housing_agent", lambda state: housing_agent(state, llm))
+# ✅ 노드마다 sync/async 구현을 같이 등록 → app.invoke 와 app.ainvoke 모두 지원
+graph.add_node("intent_router", RunnableLambda(intent_router, afunc=aintent_router))
+graph.add_node("loan_agent", RunnableLambda(lambda state: loan_agent(state, agent_llm.get()), afunc=_aloan_node))
+graph.add_node("housing_agent", RunnableLambda(lambda state: housing_agent(state, agent_llm.get()), afunc=_ahousing_node))
 
 graph.set_entry_point("intent_router")
 
@@ -1,89 +1,239 @@
 import os
-import torch
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+import asyncio
+import threading
+from contextlib import aclosing
+from fastapi import FastAPI, Request, Form, HTTPException
+from fastapi.responses import HTMLResponse, StreamingResponse, FileResponse, Response, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel
-from pdf2image import convert_from_path
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from peft import PeftModel
+from pydantic import BaseModel, Field, conint
+from typing import List, Optional
 from graph.main_graph import app as chatbot_app  # 주택/대출 챗봇
+from agents.intent_router import classifier as intent_classifier
+from agents.loan_agent import DB_PATH as LOAN_DB_PATH, loan_memory
+from agents.housing_agent import housing_memory
+from utils.loan_calculator import compute_loan_grid
+from utils.executor import run_blocking, shutdown_executor
+from utils.batching import MicroBatcher
+from utils.streaming import sse_event, aiter_blocking
+from utils.page_cache import PageImageCache
+from utils.embedding_service import embedding_service
+from utils.lazy import register, readiness, warmup_all
+from utils.answer_cache import SemanticAnswerCache, notice_answer_cache
+from utils.vectordb_search import invalidate_notice_index
+from utils.session_store import (
+    SESSION_TTL, SessionLocks, create_session_store, new_session_id, is_valid_session_id
+)
+from utils.clovax_model import SYSTEM_MESSAGES, load_clovax, build_prefix_cache, generate_with_prefix, cancel_criteria
 # from PEFT.naver import ask_clovax_clean  ❌ 이름 충돌로 사용 불가
 
-# ✅ Clova X QnA 함수 정의 (직접 포함)
-base_model_path = "naver-hyperclovax/HyperCLOVAX-SEED-Text-Instruct-1.5B"
-adapter_path = "/home/alpaco/test/fine/finetuned_hyperclovax30"
+# ✅ Clova X QnA 모델 (첫 사용 / 워밍업 때 로드, 병합 가중치 우선 → utils/clovax_model.py)
+#    로드하면서 고정 시스템 프롬프트의 KV 캐시도 같이 계산 (질문마다 사용자 턴만 prefill)
+def _load_clovax():
+    model, tokenizer, _ = load_clovax()
+    return model, tokenizer, build_prefix_cache(model, tokenizer)
 
-base_model = AutoModelForCausalLM.from_pretrained(
-    base_model_path,
-    torch_dtype=torch.bfloat16,
-    device_map="auto"
-)
-model = PeftModel.from_pretrained(base_model, adapter_path).eval()
-tokenizer = AutoTokenizer.from_pretrained(base_model_path)
 
+clovax = register("clovax", _load_clovax, warm=lambda _: ask_clovax_batch(["안녕하세요"], max_new_tokens=1))
 
-def ask_clovax_clean(question: str, max_new_tokens=256) -> str:
-    messages = [
-        {"role": "tool_list", "content": ""},
-        {"role": "system", "content": "- AI 언어모델의 이름은 \"CLOVA X\" 이며 네이버에서 만들었다.\n- 오늘은 2025년 04월 24일(목)이다."},
-        {"role": "user", "content": question}
-    ]
-    enc = tokenizer.apply_chat_template(messages, add_generation_prompt=True, return_tensors="pt")
-    input_ids = enc["input_ids"].to(model.device) if isinstance(enc, dict) else enc.to(model.device)
-    attention_mask = enc["attention_mask"].to(model.device) if isinstance(enc, dict) else torch.ones_like(input_ids)
-    with torch.no_grad():
-        output_ids = model.generate(
-            input_ids=input_ids,
-            attention_mask=attention_mask,
-            max_new_tokens=max_new_tokens,
-            temperature=0.7,
-            top_p=0.9,
-            do_sample=False,
-            repetition_penalty=1.2,
-            eos_token_id=tokenizer.eos_token_id
-        )
-    decoded = tokenizer.decode(output_ids[0], skip_special_tokens=False)
+
+def _parse_answer(decoded: str) -> str:
     if "<|im_start|>assistant" in decoded:
         response = decoded.split("<|im_start|>assistant")[-1]
         return response.replace("<|im_end|>", "").split("<|")[0].strip()
     return decoded.strip()
 
 
+def ask_clovax_batch(questions: list, max_new_tokens=256) -> list:
+    """여러 질문을 왼쪽 패딩으로 묶어 generate 한 번으로 답변 생성 (1건이면 시스템 프롬프트 KV 캐시 재사용)"""
+    model, tokenizer, prefix = clovax.get()
+    prompts = [
+        tokenizer.apply_chat_template(
+            SYSTEM_MESSAGES + [{"role": "user", "content": q}],
+            add_generation_prompt=True,
+            tokenize=False
+        )
+        for q in questions
+    ]
+    enc = tokenizer(prompts, return_tensors="pt", padding=True, add_special_tokens=False)
+    input_ids = enc["input_ids"].to(model.device)
+    attention_mask = enc["attention_mask"].to(model.device)
+    output_ids = generate_with_prefix(
+        model,
+        prefix,
+        input_ids=input_ids,
+        attention_mask=attention_mask,
+        max_new_tokens=max_new_tokens,
+        temperature=0.7,
+        top_p=0.9,
+        do_sample=False,
+        repetition_penalty=1.2,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.pad_token_id
+    )
+    return [_parse_answer(tokenizer.decode(ids, skip_special_tokens=False)) for ids in output_ids]
+
+
+def ask_clovax_clean(question: str, max_new_tokens=256) -> str:
+    return ask_clovax_batch([question], max_new_tokens=max_new_tokens)[0]
+
+
+# ✅ /qna/stream 동시 생성 수 제한 (스트림마다 generate 스레드 하나가 끝날 때까지 모델을 점유)
+QNA_MAX_STREAMS = int(os.getenv("QNA_MAX_STREAMS", "2"))
+_stream_slots = asyncio.Semaphore(QNA_MAX_STREAMS)
+
+
+async def stream_clovax(question: str, max_new_tokens=256):
+    """
+    TextIteratorStreamer 로 생성되는 토큰을 바로바로 yield (별도 스레드에서 generate)
+    - 동시에 QNA_MAX_STREAMS 개까지만 생성, 나머지는 슬롯이 빌 때까지 대기
+    - 답변이 끝나거나(<|) 클라이언트가 끊기면 cancel 이벤트로 generate 도 바로 중단
+    """
+    from transformers import TextIteratorStreamer
+
+    model, tokenizer, prefix = await run_blocking(clovax.get)
+    prompt = tokenizer.apply_chat_template(
+        SYSTEM_MESSAGES + [{"role": "user", "content": question}],
+        add_generation_prompt=True,
+        tokenize=False
+    )
+    enc = tokenizer(prompt, return_tensors="pt", add_special_tokens=False)
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=False)
+    cancel = threading.Event()
+    generate_kwargs = dict(
+        input_ids=enc["input_ids"].to(model.device),
+        attention_mask=enc["attention_mask"].to(model.device),
+        max_new_tokens=max_new_tokens,
+        temperature=0.7,
+        top_p=0.9,
+        do_sample=False,
+        repetition_penalty=1.2,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.pad_token_id,
+        streamer=streamer,
+        stopping_criteria=cancel_criteria(cancel)
+    )
+    loop = asyncio.get_running_loop()
+
+    def _generate():
+        try:
+            generate_with_prefix(model, prefix, **generate_kwargs)
+        except Exception as e:
+            print("❌ ClovaX 스트리밍 생성 실패:", e)
+            streamer.end()  # 기다리는 쪽이 멈춰 있지 않도록 스트림 종료
+        finally:
+            loop.call_soon_threadsafe(_stream_slots.release)
+
+    await _stream_slots.acquire()
+    try:
+        threading.Thread(target=_generate, daemon=True).start()
+    except BaseException:
+        _stream_slots.release()
+        raise
+
+    try:
+        # _parse_answer 와 같은 규칙: 첫 특수 토큰(<|im_end|> 등)에서 답변 종료
+        async for text in aiter_blocking(streamer):
+            if "<|" in text:
+                head = text.split("<|")[0]
+                if head:
+                    yield head
+                break
+            yield text
+    finally:
+        cancel.set()
+
+
+# ✅ /qna 동시 요청을 모아서 한 번에 generate (마이크로 배칭)
+QNA_MAX_BATCH_SIZE = int(os.getenv("QNA_MAX_BATCH_SIZE", "8"))
+QNA_MAX_WAIT_MS = float(os.getenv("QNA_MAX_WAIT_MS", "20"))
+qna_batcher = MicroBatcher(ask_clovax_batch, max_batch_size=QNA_MAX_BATCH_SIZE, max_wait_ms=QNA_MAX_WAIT_MS)
+
+# ✅ 반복되는 정책/용어 질문은 생성 없이 캐시에서 응답 (정확 일치 → 임베딩 유사도)
+qna_cache = SemanticAnswerCache(embedding_service.embed_query)
+
+
 # ✅ FastAPI 앱 설정
 app = FastAPI()
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# ✅ QnA 전역 히스토리 (임시)
-qna_history = []
+
+# ✅ 모델은 요청 경로에서 처음 쓸 때 로드되지만, 기본값으로는 서버가 뜬 직후 백그라운드에서 미리 로드
+#    (WARMUP_ON_STARTUP=0 이면 순수 지연 로딩 → /warmup 으로 직접 준비)
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+
+
+@app.on_event("startup")
+async def on_startup():
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=warmup_all, daemon=True, name="welhome-startup-warmup").start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    shutdown_executor()
+
+
+# ✅ 세션 저장소: 대화 상태(chat)와 QnA 히스토리(qna)를 서버에 보관
+#    - /chat 은 query + session_id 만 받고, 응답에는 화면에 필요한 상태 중 바뀐 값만 담는다
+#    - /qna 는 쿠키의 세션 ID 로 사용자별 히스토리를 최근 QNA_HISTORY_MAX 개까지 유지
+session_store = create_session_store()
+session_locks = SessionLocks()
+SESSION_COOKIE = "welhome_session"
+QNA_HISTORY_MAX = int(os.getenv("QNA_HISTORY_MAX", "20"))
+
+# 브라우저가 쓰는 상태 (페이지 이미지 표시/이동). 나머지(히스토리, 공고 목록 등)는 서버에만 둔다
+CLIENT_STATE_KEYS = ("intent", "notice_id", "pages", "current_page", "page_image")
 
 
 # ✅ Chat API 모델 정의 (JSON 기반)
 class ChatRequest(BaseModel):
     query: str
-    state: dict
+    session_id: Optional[str] = None
+    state: Optional[dict] = None  # 이전 클라이언트 호환용: 새 세션의 초기 상태로만 사용
 
 
 class ChatResponse(BaseModel):
     result: str
-    state: dict
+    session_id: str
+    state: dict  # CLIENT_STATE_KEYS 중 이번 요청에서 바뀐 값
+
+
+def _client_view(state: dict) -> dict:
+    return {key: state.get(key) for key in CLIENT_STATE_KEYS}
+
+
+def _state_delta(before: dict, state: dict) -> dict:
+    return {key: value for key, value in _client_view(state).items() if before.get(key) != value}
+
+
+async def _load_session(session_id: Optional[str]):
+    """
+    (세션 ID, 세션 데이터). 클라이언트가 보낸 ID 가 저장소에 없으면(없음/만료/임의 지정)
+    그 ID 를 쓰지 않고 서버가 새 ID 를 발급 (세션 고정 방지)
+    """
+    if is_valid_session_id(session_id):
+        data = await run_blocking(session_store.load, session_id)
+        if data is not None:
+            return session_id, data
+    return new_session_id(), {}
 
 
-# ✅ PDF → PNG 변환 함수
-def convert_pdf_to_page_png(pdf_path: str, output_dir: str, page_number: int):
-    output_path = os.path.join(output_dir, f"page_{page_number}.png")
-    if os.path.exists(output_path):
-        os.remove(output_path)
-        print(f"🗑 기존 파일 삭제: {output_path}")
-    os.makedirs(output_dir, exist_ok=True)
-    images = convert_from_path(pdf_path, first_page=page_number, last_page=page_number)
-    if images:
-        images[0].save(output_path, "PNG")
-        print(f"✅ PNG 저장됨: {output_path}")
-    else:
-        print("⚠️ PDF에서 페이지 변환 실패")
+async def _session_data(session_id: str) -> dict:
+    """서버가 발급한 ID 의 세션 데이터 (아직 저장 전이면 빈 세션)"""
+    data = await run_blocking(session_store.load, session_id)
+    return data if data is not None else {}
+
+
+# ✅ PDF → 페이지 이미지 (디스크 캐시, 같은 공고/페이지는 한 번만 렌더링)
+page_cache = PageImageCache()
+
+
+def render_notice_page(notice_id: str, page_number: int):
+    """공고 PDF 의 해당 페이지 이미지 URL (렌더링 실패/공고 없음이면 None)"""
+    filename = page_cache.get_or_render(f"static/{notice_id}.pdf", notice_id, page_number)
+    return f"/page-image/{filename}" if filename else None
 
 
 # ✅ 메인 페이지
@@ -98,55 +248,274 @@ async def serve_chat_ui(request: Request):
     return templates.TemplateResponse("chat.html", {"request": request})
 
 
-# ✅ 주택/대출 챗봇: POST (API 처리)
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
-    state = request.state or {}
-    query = request.query.strip()
-
+def _parse_page_command(query: str):
+    """'페이지 N' 입력이면 N, 아니면 None"""
     if query.startswith("페이지") and query[3:].strip().isdigit():
-        page_number = int(query[3:].strip())
-        state["pages"] = page_number
-        state["current_page"] = page_number
-        notice_id = state.get("notice_id")
-        if notice_id:
-            convert_pdf_to_page_png(f"static/{notice_id}.pdf", "static/pages", page_number)
-        return ChatResponse(result=f"(페이지 {page_number})", state=state)
+        return int(query[3:].strip())
+    return None
+
 
-    state["query"] = query
-    new_state = chatbot_app.invoke(state)
+async def _goto_page(state: dict, page_number: int) -> dict:
+    state["pages"] = page_number
+    state["current_page"] = page_number
+    notice_id = state.get("notice_id")
+    if notice_id:
+        state["page_image"] = await run_blocking(render_notice_page, notice_id, page_number)
+    return state
 
+
+async def _render_answer_page(new_state: dict):
+    """에이전트가 근거 페이지를 남겼으면 해당 PDF 페이지를 이미지로 준비"""
     try:
         notice_id = new_state.get("notice_id")
         pages = new_state.get("pages")
         if notice_id and pages:
             page_number = int(pages[0] if isinstance(pages, list) else pages)
             new_state["current_page"] = page_number
-            convert_pdf_to_page_png(f"static/{notice_id}.pdf", "static/pages", page_number)
+            new_state["page_image"] = await run_blocking(render_notice_page, notice_id, page_number)
     except Exception as e:
         print("❌ 페이지 이미지 처리 실패:", e)
 
-    return ChatResponse(result=new_state.get("result", ""), state=new_state)
 
+# ✅ 캐시된 페이지 이미지 - 파일명이 내용(PDF 서명 포함)을 가리키므로 영구 캐시 가능
+@app.get("/page-image/{filename}")
+async def serve_page_image(filename: str, request: Request):
+    path = page_cache.path_for(filename)
+    if not path:
+        raise HTTPException(status_code=404, detail="page image not found")
 
-# ✅ Q&A 챗봇 (ClovaX 기반)
-@app.get("/qna", response_class=HTMLResponse)
-async def get_qna(request: Request):
-    return templates.TemplateResponse("qna.html", {
+    headers = {
+        "ETag": f'"{filename}"',
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers)
+
+
+# ✅ 주택/대출 챗봇: POST (API 처리)
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest):
+    query = request.query.strip()
+
+    async with session_locks(request.session_id):
+        session_id, session = await _load_session(request.session_id)
+        state = session.get("chat") or request.state or {}
+        before = _client_view(state)
+
+        page_number = _parse_page_command(query)
+        if page_number is not None:
+            new_state = await _goto_page(state, page_number)
+            result = f"(페이지 {page_number})"
+        else:
+            # ✅ 그래프를 비동기로 실행 → 한 사용자의 느린 LLM/DB 호출이 다른 요청을 막지 않음
+            state["query"] = query
+            new_state = await chatbot_app.ainvoke(state)
+            await _render_answer_page(new_state)
+            result = new_state.get("result", "")
+
+        session["chat"] = new_state
+        await run_blocking(session_store.save, session_id, session)
+
+    return ChatResponse(result=result, session_id=session_id, state=_state_delta(before, new_state))
+
+
+# ✅ 주택/대출 챗봇: POST (SSE 스트리밍)
+#    - event 없음: {"token": "..."}  LLM 토큰이 나오는 대로 전달
+#    - event: done : {"result": ..., "session_id": ..., "state": ...}  /chat 과 같은 최종 응답
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    query = request.query.strip()
+
+    async def event_stream():
+        async with session_locks(request.session_id):
+            session_id, session = await _load_session(request.session_id)
+            state = session.get("chat") or request.state or {}
+            before = _client_view(state)
+
+            page_number = _parse_page_command(query)
+            if page_number is not None:
+                page_state = await _goto_page(state, page_number)
+                session["chat"] = page_state
+                await run_blocking(session_store.save, session_id, session)
+                yield sse_event({"result": f"(페이지 {page_number})", "session_id": session_id,
+                                 "state": _state_delta(before, page_state)}, event="done")
+                return
+
+            tokens = asyncio.Queue()
+
+            async def on_token(token):
+                await tokens.put(token)
+
+            state["query"] = query
+            task = asyncio.create_task(
+                chatbot_app.ainvoke(state, config={"configurable": {"on_token": on_token}})
+            )
+            try:
+                while not task.done() or not tokens.empty():
+                    getter = asyncio.ensure_future(tokens.get())
+                    await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                    if getter.done():
+                        yield sse_event({"token": getter.result()})
+                    else:
+                        getter.cancel()
+
+                new_state = task.result()
+                await _render_answer_page(new_state)
+                session["chat"] = new_state
+                await run_blocking(session_store.save, session_id, session)
+                yield sse_event({"result": new_state.get("result", ""), "session_id": session_id,
+                                 "state": _state_delta(before, new_state)}, event="done")
+            except Exception as e:
+                print("❌ 스트리밍 처리 실패:", e)
+                yield sse_event({"error": "처리 중 오류가 발생했습니다."}, event="error")
+            finally:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+# ✅ 대출 what-if 격자: 금액 × 기간 × 상품 전체를 한 번에 계산 (차트용)
+LOAN_GRID_MAX_AMOUNT = 10_000_000_000  # 100억 원
+
+
+class LoanGridRequest(BaseModel):
+    amounts: List[conint(gt=0, le=LOAN_GRID_MAX_AMOUNT)] = Field(..., min_length=1, max_length=200)
+    years: List[conint(ge=1, le=99)] = Field(..., min_length=1, max_length=50)
+    schedule_amount: Optional[int] = Field(None, gt=0, le=LOAN_GRID_MAX_AMOUNT)
+    schedule_years: Optional[int] = Field(None, ge=1, le=50)
+
+
+@app.post("/loan/grid")
+async def loan_grid(request: LoanGridRequest):
+    return await run_blocking(
+        compute_loan_grid, request.amounts, request.years, LOAN_DB_PATH,
+        request.schedule_amount, request.schedule_years
+    )
+
+
+# ✅ 준비 상태 / 워밍업
+@app.get("/ready")
+async def ready():
+    """모든 무거운 구성요소가 로드됐으면 200, 아니면 503 (구성요소별 상태 포함)"""
+    components = readiness()
+    is_ready = all(c["loaded"] for c in components.values())
+    return JSONResponse(status_code=200 if is_ready else 503, content={"ready": is_ready, "components": components})
+
+
+@app.post("/warmup")
+async def warmup():
+    """구성요소 로드 + 짧은 추론 한 번으로 첫 요청 비용을 미리 치름"""
+    components = await run_blocking(warmup_all)
+    return {"ready": all(c["loaded"] for c in components.values()), "components": components}
+
+
+# ✅ 공고 청크를 다시 적재한 뒤 호출 → 공고별 검색 색인 + 공고 Q&A 답변 캐시 무효화 (notice_id 없으면 전체)
+class NoticeInvalidateRequest(BaseModel):
+    notice_id: Optional[str] = None
+
+
+@app.post("/notices/invalidate")
+async def invalidate_notices(req: NoticeInvalidateRequest):
+    invalidate_notice_index(req.notice_id)
+    return {"invalidated": req.notice_id or "all", "notice_cache": notice_answer_cache.stats()}
+
+
+# ✅ 운영 지표 (intent 분류 단계별 적중률, 캐시 적중률, 세션 수 등)
+@app.get("/metrics")
+async def metrics():
+    return {
+        "intent": intent_classifier.stats(),
+        "embedding": embedding_service.stats(),
+        "qna_cache": qna_cache.stats(),
+        "notice_cache": notice_answer_cache.stats(),
+        "sessions": session_store.stats(),
+        "history": {"loan": loan_memory.stats(), "housing": housing_memory.stats()}
+    }
+
+
+# ✅ Q&A 챗봇 (ClovaX 기반) - 히스토리는 쿠키 세션별로 최근 QNA_HISTORY_MAX 개만 유지
+def _qna_response(request: Request, session_id: str, history: list):
+    response = templates.TemplateResponse("qna.html", {
         "request": request,
-        "chat_history": qna_history
+        "chat_history": history
     })
+    response.set_cookie(SESSION_COOKIE, session_id, max_age=int(SESSION_TTL), httponly=True, samesite="lax")
+    return response
+
+
+async def _save_qna_entry(session_id: str, entry: dict):
+    async with session_locks(session_id):
+        session = await _session_data(session_id)
+        history = session.setdefault("qna", [])
+        history.append(entry)
+        del history[:-QNA_HISTORY_MAX]
+        await run_blocking(session_store.save, session_id, session)
+
+
+@app.get("/qna", response_class=HTMLResponse)
+async def get_qna(request: Request):
+    session_id, session = await _load_session(request.cookies.get(SESSION_COOKIE))
+    return _qna_response(request, session_id, session.get("qna", []))
 
 
 @app.post("/qna", response_class=HTMLResponse)
 async def post_qna(request: Request, user_input: str = Form(...)):
-    qna_history.append({"user": user_input, "bot": None})
-    answer = ask_clovax_clean(user_input)
-    qna_history[-1]["bot"] = answer
-    return templates.TemplateResponse("qna.html", {
-        "request": request,
-        "chat_history": qna_history
-    })
+    session_id, _ = await _load_session(request.cookies.get(SESSION_COOKIE))
+    answer, _ = await qna_cache.get_or_compute(user_input, qna_batcher.submit)
+    await _save_qna_entry(session_id, {"user": user_input, "bot": answer})
+    session = await _session_data(session_id)
+    return _qna_response(request, session_id, session.get("qna", []))
+
+
+# ✅ Q&A 챗봇: SSE 스트리밍 ({"token": ...} 반복 → event: done {"answer": ...})
+@app.post("/qna/stream")
+async def post_qna_stream(request: Request, user_input: str = Form(...)):
+    session_id, _ = await _load_session(request.cookies.get(SESSION_COOKIE))
+
+    async def event_stream():
+        # 같은 질문을 생성 중인 요청이 있으면 그 결과를 기다려 캐시 적중처럼 한 번에 전송
+        try:
+            answer = await qna_cache.wait_inflight(user_input)
+        except Exception as e:
+            print("❌ QnA 스트리밍 실패:", e)
+            yield sse_event({"error": "처리 중 오류가 발생했습니다."}, event="error")
+            return
+
+        cached = answer is not None
+        if not cached:
+            future = qna_cache.start(user_input)
+            try:
+                answer, _, vector = await qna_cache.lookup(user_input)
+                cached = answer is not None
+                if not cached:
+                    chunks = []
+                    # 클라이언트가 끊겨 이 제너레이터가 닫히면 stream_clovax 도 바로 닫혀 생성이 중단됨
+                    async with aclosing(stream_clovax(user_input)) as tokens:
+                        async for text in tokens:
+                            chunks.append(text)
+                            yield sse_event({"token": text})
+                    answer = "".join(chunks).strip()
+                    qna_cache.put(user_input, answer, vector)
+            except Exception as e:
+                qna_cache.finish(user_input, future, error=e)
+                print("❌ QnA 스트리밍 실패:", e)
+                yield sse_event({"error": "처리 중 오류가 발생했습니다."}, event="error")
+                return
+            except BaseException as e:  # 연결 끊김/취소 → 기다리던 요청 중 하나가 이어서 생성
+                qna_cache.finish(user_input, future, error=e)
+                raise
+            qna_cache.finish(user_input, future, answer)
+
+        await _save_qna_entry(session_id, {"user": user_input, "bot": answer})
+        if cached:
+            yield sse_event({"token": answer})
+        yield sse_event({"answer": answer, "cached": cached}, event="done")
+
+    response = StreamingResponse(event_stream(), media_type="text/event-stream")
+    response.set_cookie(SESSION_COOKIE, session_id, max_age=int(SESSION_TTL), httponly=True, samesite="lax")
+    return response
 
 
 # ✅ 실행
@@ -0,0 +1,311 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from utils.executor import run_blocking
+
+# ✅ /qna 답변 시맨틱 캐시
+#    1) 정규화한 질문 해시 정확 일치  2) 질문 임베딩 최근접 이웃 (코사인 ≥ 임계값)
+#    - TTL 지난 항목은 조회 시 제거, 최대 개수를 넘으면 가장 오래 안 쓴 항목부터 제거 (LRU)
+#    - 같은 질문이 동시에 들어오면 생성은 한 번만 하고 나머지는 그 결과를 기다림
+QNA_CACHE_THRESHOLD = float(os.getenv("QNA_CACHE_THRESHOLD", "0.93"))
+QNA_CACHE_TTL = float(os.getenv("QNA_CACHE_TTL", "86400"))
+QNA_CACHE_MAX_ENTRIES = int(os.getenv("QNA_CACHE_MAX_ENTRIES", "2000"))
+QNA_CACHE_MAX_ANSWER_CHARS = int(os.getenv("QNA_CACHE_MAX_ANSWER_CHARS", "4000"))
+
+# ✅ 공고 Q&A 답변 캐시: (공고 ID, 정규화 질문, 검색된 청크) 가 같으면 LLM 호출 없이 답변
+#    - 청크 키에 내용 해시를 포함하므로 청크가 바뀌면 자연히 다른 키가 됨
+#    - 공고를 다시 적재하면 invalidate_notice_index 가 해당 공고 항목을 함께 삭제
+NOTICE_CACHE_TTL = float(os.getenv("NOTICE_CACHE_TTL", "21600"))
+NOTICE_CACHE_MAX_ENTRIES = int(os.getenv("NOTICE_CACHE_MAX_ENTRIES", "5000"))
+
+_PUNCT = re.compile(r"[^\w\s]")
+
+
+def normalize_question(text: str) -> str:
+    """정확 일치 키: 문장부호 제거 + 공백 정리 + 소문자 ("행복주택이 뭐야?" == "행복주택이  뭐야")"""
+    return " ".join(_PUNCT.sub(" ", text).split()).lower()
+
+
+class ComputeAborted(Exception):
+    """같은 질문을 먼저 생성하던 요청이 취소됨 (기다리던 요청은 다시 시도)"""
+
+
+class SemanticAnswerCache:
+    """
+    embed_fn(text) -> 정규화된 벡터 (동기 함수, 스레드 풀에서 실행)
+    벡터는 슬롯 배열(max_entries × dim)에 보관해 최근접 이웃을 행렬곱 한 번으로 찾는다
+    이벤트 루프 안에서만 호출 (별도 락 없음)
+    """
+
+    def __init__(self, embed_fn, threshold: float = QNA_CACHE_THRESHOLD, ttl: float = QNA_CACHE_TTL,
+                 max_entries: int = QNA_CACHE_MAX_ENTRIES, max_answer_chars: int = QNA_CACHE_MAX_ANSWER_CHARS):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_answer_chars = max_answer_chars
+
+        self._entries = OrderedDict()  # key -> (answer, slot, created_at)
+        self._vectors = None           # (max_entries, dim)
+        self._slot_keys = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._inflight = {}
+
+        # 📊 모니터링용 카운터
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    # ---------- 저장소 ----------
+    def _remove(self, key):
+        _, slot, _ = self._entries.pop(key)
+        if slot is not None:
+            self._slot_keys[slot] = None
+            self._free_slots.append(slot)
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def _get_exact(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._is_expired(entry[2]):
+            self._remove(key)
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _get_nearest(self, vector):
+        if self._vectors is None or vector is None or not self._entries:
+            return None
+        live = [i for i, k in enumerate(self._slot_keys) if k is not None]
+        if not live:
+            return None
+        scores = self._vectors[live] @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return self._get_exact(self._slot_keys[live[best]])
+
+    def put(self, question: str, answer: str, vector=None):
+        if not answer or len(answer) > self.max_answer_chars:
+            return
+        key = normalize_question(question)
+        if key in self._entries:
+            self._remove(key)
+        while len(self._entries) >= self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+        slot = None
+        if vector is not None:
+            vector = np.asarray(vector, dtype=np.float32)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._slot_keys[slot] = key
+        self._entries[key] = (answer, slot, time.time())
+
+    async def _embed(self, question: str):
+        try:
+            return np.asarray(await run_blocking(self.embed_fn, question), dtype=np.float32)
+        except Exception as e:
+            print(f"⚠️ 질문 임베딩 실패, 정확 일치만 사용: {e}")
+            return None
+
+    # ---------- 조회 ----------
+    async def lookup(self, question: str):
+        """(답변 또는 None, 'exact' | 'semantic' | 'miss', 질문 벡터)"""
+        answer = self._get_exact(normalize_question(question))
+        if answer is not None:
+            self.exact_hits += 1
+            return answer, "exact", None
+
+        vector = await self._embed(question)
+        answer = self._get_nearest(vector)
+        if answer is not None:
+            self.semantic_hits += 1
+            return answer, "semantic", vector
+        self.misses += 1
+        return None, "miss", vector
+
+    # ---------- 동시 요청 합치기 (/qna, /qna/stream 공용) ----------
+    async def wait_inflight(self, question: str):
+        """
+        같은 질문을 생성 중인 요청이 있으면 그 답변을 기다려 반환, 없으면 None (→ 호출자가 start 로 생성 시작)
+        생성하던 요청이 끊기거나 취소되면 다시 확인 → 기다리던 요청 중 하나가 이어서 생성
+        """
+        key = normalize_question(question)
+        while (future := self._inflight.get(key)) is not None:
+            try:
+                answer = await asyncio.shield(future)
+            except ComputeAborted:
+                continue
+            self.coalesced += 1
+            return answer
+        return None
+
+    def start(self, question: str):
+        """이 질문을 생성 중으로 등록 (wait_inflight 가 None 을 돌려준 직후, await 없이 호출)"""
+        future = self._inflight[normalize_question(question)] = asyncio.get_running_loop().create_future()
+        return future
+
+    def finish(self, question: str, future, answer=None, error: BaseException = None):
+        """생성 결과를 기다리던 요청에 전달. 취소/연결 끊김은 전달하지 않고 ComputeAborted 로 바꿈"""
+        key = normalize_question(question)
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if future.done():
+            return
+        if error is None:
+            future.set_result(answer)
+            return
+        future.set_exception(error if isinstance(error, Exception) else ComputeAborted())
+        future.exception()  # 기다리는 쪽이 없어도 경고가 나지 않도록
+
+    async def get_or_compute(self, question: str, compute):
+        """캐시 → 없으면 await compute(question) 결과를 저장. (답변, 출처) 반환"""
+        answer = await self.wait_inflight(question)
+        if answer is not None:
+            return answer, "coalesced"
+
+        future = self.start(question)
+        try:
+            answer, source, vector = await self.lookup(question)
+            if answer is None:
+                answer = await compute(question)
+                self.put(question, answer, vector)
+        except BaseException as e:
+            self.finish(question, future, error=e)
+            raise
+        self.finish(question, future, answer)
+        return answer, source
+
+    def clear(self):
+        for key in list(self._entries):
+            self._remove(key)
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.semantic_hits + self.coalesced
+        lookups = hits + self.misses
+        return {
+            "size": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "threshold": self.threshold,
+        }
+
+
+def chunk_key(doc) -> str:
+    """검색 청크 식별자: Chroma id(있으면) + 내용 해시"""
+    ident = (doc.metadata or {}).get("chunk_id") or getattr(doc, "id", None) or ""
+    return hashlib.sha1(f"{ident}\x00{doc.page_content}".encode("utf-8")).hexdigest()[:12]
+
+
+class NoticeAnswerCache:
+    """
+    key -> (답변 원문, 렌더링된 HTML, 페이지 번호)
+    동기 에이전트(스레드 풀)와 async 에이전트 양쪽에서 호출되므로 락으로 보호
+    """
+
+    def __init__(self, ttl: float = NOTICE_CACHE_TTL, max_entries: int = NOTICE_CACHE_MAX_ENTRIES,
+                 max_answer_chars: int = QNA_CACHE_MAX_ANSWER_CHARS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_answer_chars = max_answer_chars
+        self._entries = OrderedDict()  # key -> (value, created_at)
+        self._by_notice = {}           # notice_id -> {key, ...}
+        self._lock = threading.Lock()
+
+        # 📊 모니터링용 카운터
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidated = 0
+        self.context_skips = 0  # 이전 대화에 기대는 후속 질문이라 캐시를 건너뛴 횟수
+
+    @staticmethod
+    def key(notice_id: str, question: str, documents) -> tuple:
+        return notice_id, normalize_question(question), tuple(chunk_key(d) for d in documents)
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_notice.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_notice[key[0]]
+
+    def skip(self):
+        with self._lock:
+            self.context_skips += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 and time.time() - entry[1] > self.ttl:
+                self._remove(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, answer: str, html: str, pages):
+        if not answer or len(answer) > self.max_answer_chars:
+            return
+        with self._lock:
+            self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            self._entries[key] = ((answer, html, pages), time.time())
+            self._by_notice.setdefault(key[0], set()).add(key)
+
+    def invalidate(self, notice_id: str = None):
+        """공고 하나(None 이면 전체)의 답변 삭제"""
+        with self._lock:
+            keys = list(self._entries) if notice_id is None else list(self._by_notice.get(notice_id, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidated += len(keys)
+
+    def clear(self):
+        self.invalidate()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "notices": len(self._by_notice),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "invalidated": self.invalidated,
+            "context_skips": self.context_skips,
+        }
+
+
+notice_answer_cache = NoticeAnswerCache()
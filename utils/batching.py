@@ -0,0 +1,75 @@
+import asyncio
+from utils.executor import run_blocking
+
+
+class MicroBatcher:
+    """
+    동시에 들어온 요청을 짧은 시간 동안 모아서 batch_fn 한 번으로 처리하는 큐
+    - batch_fn(items) -> results : 입력 순서대로 결과 리스트를 돌려주는 동기 함수
+    - max_batch_size 가 차거나 첫 요청 이후 max_wait_ms 가 지나면 바로 실행
+    - 배치는 한 번에 하나씩만 실행 (모델 하나를 여러 스레드가 동시에 쓰지 않도록)
+      → 한 배치가 도는 동안 들어온 요청은 자연스럽게 다음 배치로 모인다
+    """
+
+    def __init__(self, batch_fn, max_batch_size: int = 8, max_wait_ms: float = 20):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._worker = None
+        # 📊 벤치마크/모니터링용 카운터
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # 이미 취소된 요청(클라이언트 연결 끊김 등)은 배치에서 제외
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            items = [item for item, _ in batch]
+            try:
+                results = await run_blocking(self.batch_fn, items)
+            except Exception as e:
+                print(f"❌ 배치 처리 실패 (size={len(items)}): {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0
+        }
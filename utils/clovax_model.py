@@ -0,0 +1,232 @@
+import os
+import copy
+import json
+import time
+import shutil
+import hashlib
+import torch
+
+# ✅ /qna 모델(HyperCLOVAX + LoRA) 로딩
+#    - QNA_WEIGHTS=auto(기본): 병합 가중치가 있으면 그대로 로드, 없으면 어댑터를 병합해 캐시 후 사용
+#      merged: 병합 가중치만 사용 (없으면 생성) / adapter: PeftModel 로 어댑터를 얹어서 사용 (기존 방식)
+#    - 병합 가중치는 merge_and_unload 결과라 forward 마다 LoRA 행렬곱이 추가되지 않는다
+#    - merge_info.json 에 어댑터 파일 서명을 기록해 어댑터가 바뀌면 다시 병합
+#    - QNA_QUANTIZE=int8: GPU 없는 노드용 CPU 모드 (fp32 로드 → nn.Linear int8 동적 양자화)
+#      QNA_THREADS 로 CPU 연산 스레드 수 지정 (기본: torch 기본값)
+BASE_MODEL_PATH = os.getenv("BASE_MODEL", "naver-hyperclovax/HyperCLOVAX-SEED-Text-Instruct-1.5B")
+ADAPTER_PATH = os.getenv("LORA_ADAPTER", "/home/alpaco/test/fine/finetuned_hyperclovax30")
+MERGED_PATH = os.getenv("QNA_MERGED_PATH", "/home/alpaco/test/fine/merged_model")
+QNA_WEIGHTS = os.getenv("QNA_WEIGHTS", "auto")
+QNA_DTYPE = os.getenv("QNA_DTYPE", "bfloat16")
+QNA_DEVICE_MAP = os.getenv("QNA_DEVICE_MAP", "auto")
+QNA_QUANTIZE = os.getenv("QNA_QUANTIZE", "none")
+QNA_THREADS = int(os.getenv("QNA_THREADS", "0"))
+QNA_PREFIX_CACHE = os.getenv("QNA_PREFIX_CACHE", "1") == "1"
+
+WEIGHT_MODES = ("auto", "merged", "adapter")
+QUANTIZE_MODES = ("none", "int8")
+DTYPES = {"bfloat16": torch.bfloat16, "float16": torch.float16, "float32": torch.float32}
+MERGE_INFO = "merge_info.json"
+ADAPTER_FILES = ["adapter_config.json", "adapter_model.safetensors", "adapter_model.bin"]
+
+SYSTEM_MESSAGES = [
+    {"role": "tool_list", "content": ""},
+    {"role": "system", "content": "- AI 언어모델의 이름은 \"CLOVA X\" 이며 네이버에서 만들었다.\n- 오늘은 2025년 04월 24일(목)이다."},
+]
+
+
+def adapter_signature(adapter_path: str = ADAPTER_PATH, base_model_path: str = BASE_MODEL_PATH) -> str:
+    """베이스 모델 이름 + 어댑터 파일 (크기, 수정시각) 해시"""
+    h = hashlib.sha1(base_model_path.encode())
+    for name in ADAPTER_FILES:
+        path = os.path.join(adapter_path, name)
+        if os.path.exists(path):
+            st = os.stat(path)
+            h.update(f"{name}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+def merged_weights_status(merged_path: str = MERGED_PATH, adapter_path: str = ADAPTER_PATH) -> str:
+    """'fresh' | 'stale' | 'unknown'(merge_info 없이 저장된 병합본, 예: fine/model.py) | 'missing'"""
+    if not os.path.exists(os.path.join(merged_path, "config.json")):
+        return "missing"
+    info_path = os.path.join(merged_path, MERGE_INFO)
+    if not os.path.exists(info_path):
+        return "unknown"
+    with open(info_path, encoding="utf-8") as f:
+        info = json.load(f)
+    if not os.path.isdir(adapter_path):
+        return "fresh"  # 어댑터 없이 병합본만 배포된 경우
+    return "fresh" if info.get("adapter_signature") == adapter_signature(adapter_path) else "stale"
+
+
+def _load_base(path: str, dtype, device_map):
+    from transformers import AutoModelForCausalLM
+    return AutoModelForCausalLM.from_pretrained(path, torch_dtype=dtype, device_map=device_map)
+
+
+def build_merged_weights(base_model, adapter_path: str = ADAPTER_PATH, merged_path: str = MERGED_PATH,
+                         save: bool = True):
+    """어댑터를 베이스 모델에 병합하고 (save=True 면) merged_path 에 저장. 병합된 모델을 반환"""
+    from peft import PeftModel
+
+    start = time.perf_counter()
+    merged = PeftModel.from_pretrained(base_model, adapter_path).merge_and_unload()
+    print(f"🔗 LoRA 어댑터 병합 완료 ({time.perf_counter() - start:.1f}s)")
+    if not save:
+        return merged
+
+    tmp_path = f"{merged_path}.tmp-{os.getpid()}"
+    try:
+        merged.save_pretrained(tmp_path)
+        with open(os.path.join(tmp_path, MERGE_INFO), "w", encoding="utf-8") as f:
+            json.dump({
+                "base_model": BASE_MODEL_PATH,
+                "adapter_path": adapter_path,
+                "adapter_signature": adapter_signature(adapter_path),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }, f, ensure_ascii=False, indent=2)
+        if os.path.exists(merged_path):
+            shutil.rmtree(merged_path)
+        os.replace(tmp_path, merged_path)
+        print(f"💾 병합 가중치 저장: {merged_path}")
+    except OSError as e:
+        # 저장 실패해도 메모리의 병합 모델은 그대로 사용
+        print(f"⚠️ 병합 가중치 저장 실패: {e}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return merged
+
+
+def quantize_int8(model):
+    """nn.Linear 가중치를 int8 로 (활성값은 실행 시 동적 양자화). CPU + fp32 모델 전용"""
+    start = time.perf_counter()
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    print(f"🗜 int8 동적 양자화 완료 ({time.perf_counter() - start:.1f}s)")
+    return model
+
+
+def load_clovax(weights: str = QNA_WEIGHTS, dtype: str = QNA_DTYPE, device_map: str = QNA_DEVICE_MAP,
+                merged_path: str = MERGED_PATH, adapter_path: str = ADAPTER_PATH,
+                quantize: str = QNA_QUANTIZE, threads: int = QNA_THREADS, save_merged: bool = True):
+    """
+    (model, tokenizer, 사용한 가중치 'merged' | 'adapter' (+ ':int8')) 반환
+    병합 가중치를 만들거나 읽지 못하면 어댑터 방식으로 대체
+    save_merged=False 면 병합본이 없거나 낡았을 때 메모리에서만 병합 (벤치마크 등에서 배포 산출물을 건드리지 않음)
+    """
+    from transformers import AutoTokenizer
+    from peft import PeftModel
+
+    if weights not in WEIGHT_MODES:
+        raise ValueError(f"지원하지 않는 QNA_WEIGHTS: {weights} ({', '.join(WEIGHT_MODES)})")
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError(f"지원하지 않는 QNA_QUANTIZE: {quantize} ({', '.join(QUANTIZE_MODES)})")
+    if quantize == "int8" and (dtype != "float32" or device_map != "cpu"):
+        print("⚠️ int8 동적 양자화는 CPU fp32 모델에만 적용 → dtype=float32, device_map=cpu 로 로드")
+        dtype, device_map = "float32", "cpu"
+    if threads:
+        torch.set_num_threads(threads)
+    torch_dtype = DTYPES[dtype]
+
+    model, used = None, "adapter"
+    if weights in ("auto", "merged"):
+        status = merged_weights_status(merged_path, adapter_path)
+        try:
+            if status in ("fresh", "unknown"):
+                model = _load_base(merged_path, torch_dtype, device_map)
+            else:
+                if status == "stale":
+                    print("♻️ 어댑터가 바뀌어 병합 가중치를 다시 만듭니다.")
+                model = build_merged_weights(_load_base(BASE_MODEL_PATH, torch_dtype, device_map),
+                                             adapter_path, merged_path, save=save_merged)
+            used = "merged"
+        except Exception as e:
+            print(f"⚠️ 병합 가중치 사용 실패, 어댑터로 대체: {e}")
+            model = None
+
+    if model is None:
+        model = PeftModel.from_pretrained(_load_base(BASE_MODEL_PATH, torch_dtype, device_map), adapter_path)
+
+    if quantize == "int8":
+        if used == "adapter":
+            model = model.merge_and_unload()  # LoRA 래퍼 대신 일반 Linear 로 만들어 양자화
+        model = quantize_int8(model.eval())
+        used += ":int8"
+
+    tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL_PATH)
+    # ✅ 배치 생성은 왼쪽 패딩이어야 마지막 토큰 뒤에 바로 답변이 이어진다
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    print(f"🤖 ClovaX 로드: {used} 가중치, {dtype}, device_map={device_map}, threads={torch.get_num_threads()}")
+    return model.eval(), tokenizer, used
+
+
+class PrefixKVCache:
+    """
+    고정 프롬프트 앞부분(tool_list + system 메시지)의 KV 캐시를 한 번만 계산해 두고 재사용
+    - generate 마다 캐시를 복사해서 넘기므로(generate 가 캐시에 이어 씀) 동시 요청에도 안전
+    - prefill 은 사용자 턴 토큰만 계산 → time-to-first-token 단축
+    - 한 문장씩 생성할 때만 사용 (왼쪽 패딩 배치는 프롬프트 위치가 달라 기존 방식으로 처리)
+      → 부하 시 MicroBatcher 가 묶은 /qna 배치에는 이득이 없음 (benchmarks.qna_ttft --concurrency 로 측정)
+    """
+
+    def __init__(self, model, tokenizer, messages=SYSTEM_MESSAGES):
+        from transformers import DynamicCache
+
+        self.prefix_text = tokenizer.apply_chat_template(messages, tokenize=False)
+        self.prefix_ids = tokenizer(self.prefix_text, return_tensors="pt", add_special_tokens=False)["input_ids"]
+        start = time.perf_counter()
+        with torch.no_grad():
+            self.cache = model(
+                input_ids=self.prefix_ids.to(model.device), past_key_values=DynamicCache(), use_cache=True
+            ).past_key_values
+        self.enabled = True
+        print(f"🧠 시스템 프롬프트 KV 캐시: {self.prefix_ids.shape[1]} 토큰 ({time.perf_counter() - start:.2f}s)")
+
+    def __len__(self):
+        return self.prefix_ids.shape[1]
+
+    def generate_inputs(self, input_ids):
+        """input_ids(1, L) 가 캐시된 앞부분으로 시작하면 past_key_values 를 붙인 generate 인자, 아니면 None"""
+        n = len(self)
+        if not self.enabled or input_ids.shape[0] != 1 or input_ids.shape[1] <= n:
+            return None
+        if not torch.equal(input_ids[0, :n].cpu(), self.prefix_ids[0]):
+            return None
+        return {"past_key_values": copy.deepcopy(self.cache)}
+
+
+def build_prefix_cache(model, tokenizer):
+    """QNA_PREFIX_CACHE=1 일 때 PrefixKVCache (모델이 지원하지 않으면 None → 기존 방식)"""
+    if not QNA_PREFIX_CACHE:
+        return None
+    try:
+        return PrefixKVCache(model, tokenizer)
+    except Exception as e:
+        print(f"⚠️ 시스템 프롬프트 KV 캐시 생성 실패, 사용하지 않음: {e}")
+        return None
+
+
+def generate_with_prefix(model, prefix, **generate_kwargs):
+    """prefix 캐시가 맞으면 재사용해서 generate, 캐시 경로가 실패하면 끄고 기존 방식으로 다시 실행"""
+    extra = prefix.generate_inputs(generate_kwargs["input_ids"]) if prefix is not None else None
+    with torch.no_grad():
+        if extra:
+            try:
+                return model.generate(**generate_kwargs, **extra)
+            except Exception as e:
+                print(f"⚠️ KV 캐시 재사용 실패, 비활성화: {e}")
+                prefix.enabled = False
+        return model.generate(**generate_kwargs)
+
+
+def cancel_criteria(event):
+    """event 가 set 되면 다음 토큰에서 generate 를 멈추는 StoppingCriteriaList (스트리밍 중단/클라이언트 이탈용)"""
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class _Cancelled(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+    return StoppingCriteriaList([_Cancelled()])
@@ -1,43 +1,93 @@
 import sqlite3
 from typing import List, Dict
 from utils.query_builder import build_where_clause
+from utils.sqlite_pool import get_connection
 
 DEFAULT_DB_PATH = "/home/alpaco/lyj0622/project_real/data/housing_type.db"
 
+BASE_QUERY = """
+    SELECT DISTINCT p.house_id, p.house_name, p.supply_type
+    FROM program p
+    JOIN income_rule ir ON p.income_rule_id = ir.income_rule_id
+    JOIN income_reference ref
+      ON ir.income_code = ref.income_code
+      AND ref.house_id = p.house_id
+      AND ref.household_size = :household_size
+    JOIN asset_rule ar ON p.asset_rule_id = ar.asset_rule_id
+    LEFT JOIN bonus_rule br
+      ON p.house_id = br.house_id
+      AND br.household_size = :household_size
+"""
+
+# ✅ 조인 키 인덱스 (DB 를 만들거나 갱신할 때 한 번 적용: python -m utils.db_access --create-indexes)
+#    program 을 기준으로 훑고 income_rule/asset_rule 은 PK, 나머지는 아래 인덱스로 조회하게 된다
+RECOMMENDED_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_income_reference_lookup ON income_reference (income_code, house_id, household_size)",
+    "CREATE INDEX IF NOT EXISTS idx_bonus_rule_lookup ON bonus_rule (house_id, household_size)",
+]
+
+def build_housing_query(user_state: dict):
+    where_clause, params = build_where_clause(user_state)
+    params["household_size"] = user_state.get("가구원수") or 1
+    return f"{BASE_QUERY}{where_clause}", params
+
+
 def search_housing_by_condition(user_state: dict, db_path: str = DEFAULT_DB_PATH) -> List[Dict]:
     """
     사용자 상태 기반 WHERE 조건을 붙여 임대주택 유형 검색
     Returns: [{house_id: ..., house_name: ..., supply_type: ...}, ...]
     """
-    where_clause = build_where_clause(user_state)
-    household_size = user_state.get("가구원수") or 1
-
-    query = f"""
-        SELECT DISTINCT p.house_id, p.house_name, p.supply_type
-        FROM program p
-        JOIN income_rule ir ON p.income_rule_id = ir.income_rule_id
-        JOIN income_reference ref 
-          ON ir.income_code = ref.income_code
-          AND ref.house_id = p.house_id
-          AND ref.household_size = :household_size
-        JOIN asset_rule ar ON p.asset_rule_id = ar.asset_rule_id
-        LEFT JOIN bonus_rule br 
-          ON p.house_id = br.house_id 
-          AND br.household_size = :household_size
-        {where_clause}
-    """
-
-    print("\n📤 [생성된 SQL 쿼리문]:")
-    print(query)
-    print(f"\n📌 household_size = {household_size}\n")
+    query, params = build_housing_query(user_state)
+    print(f"\n📤 [임대유형 검색] params = {params}")
 
     try:
-        with sqlite3.connect(db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute(query, {"household_size": household_size})
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+        rows = get_connection(db_path).execute(query, params).fetchall()
+        return [dict(row) for row in rows]
     except sqlite3.Error as e:
         print(f"❌ [DB 오류] 조건 검색 중 문제가 발생했습니다: {e}")
         return []
+
+
+def explain_housing_query(db_path: str = DEFAULT_DB_PATH) -> List[str]:
+    """모든 조건이 들어간 문장의 EXPLAIN QUERY PLAN (인덱스를 타는지 확인용)"""
+    sample_state = {"계층": "일반", "무주택": True, "세대주": True, "총자산": 0,
+                    "자동차가액": 0, "소득": 0, "가구원수": 1}
+    query, params = build_housing_query(sample_state)
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def missing_indexes(db_path: str = DEFAULT_DB_PATH) -> List[str]:
+    with sqlite3.connect(db_path) as conn:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    return [stmt.split()[5] for stmt in RECOMMENDED_INDEXES if stmt.split()[5] not in existing]
+
+
+def create_recommended_indexes(db_path: str = DEFAULT_DB_PATH):
+    with sqlite3.connect(db_path) as conn:
+        for statement in RECOMMENDED_INDEXES:
+            conn.execute(statement)
+        conn.execute("ANALYZE")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--create-indexes", action="store_true")
+    args = parser.parse_args()
+
+    if args.create_indexes:
+        create_recommended_indexes(args.db)
+        print("✅ 인덱스 생성 완료")
+
+    print("\n🔍 [EXPLAIN QUERY PLAN]")
+    plan = explain_housing_query(args.db)
+    for line in plan:
+        print(" ", line)
+
+    missing = missing_indexes(args.db)
+    if missing:
+        print(f"⚠️ 권장 인덱스 없음: {missing} → --create-indexes 로 추가하세요.")
@@ -0,0 +1,221 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List
+from langchain_core.embeddings import Embeddings
+from utils.lazy import register
+
+# ✅ bge-m3 임베딩 서비스 (Chroma embedding_function 겸 질의 임베딩)
+#    - EMBEDDING_DEVICE: auto(기본, CUDA 있으면 cuda) | cuda | cpu
+#    - EMBEDDING_BACKEND: torch(기본) | int8(CPU 동적 양자화) | onnx(ONNX Runtime, optimum 필요)
+#    - 질의 임베딩은 정규화한 문장 기준 LRU 캐시, 동시에 들어온 질의는 한 번의 encode 로 묶음
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+DEVICE = os.getenv("EMBEDDING_DEVICE", "auto")
+BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "16"))
+MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def resolve_device(device: str = DEVICE) -> str:
+    if device != "auto":
+        return device
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def normalize_query(text: str) -> str:
+    """캐시 키: 앞뒤/중복 공백 제거 + 소문자 ("임대료가  얼마야? " == "임대료가 얼마야?")"""
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingService(Embeddings):
+    """
+    SentenceTransformer 기반 임베딩 (정규화된 dense 벡터)
+    - 모델은 첫 사용 시 로드
+    - embed_query: 캐시 → 없으면 동시 요청과 묶어서 encode
+    - embed_documents: 캐시 없이 바로 배치 encode (색인/적재용)
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, device: str = DEVICE, backend: str = BACKEND,
+                 cache_size: int = CACHE_SIZE, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_ms: float = MAX_WAIT_MS):
+        if backend not in BACKENDS:
+            raise ValueError(f"지원하지 않는 EMBEDDING_BACKEND: {backend} ({', '.join(BACKENDS)})")
+        self.model_name = model_name
+        self.device = device
+        self.backend = backend
+        self.cache_size = cache_size
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._encode_lock = threading.Lock()  # 모델 하나를 여러 스레드가 동시에 쓰지 않도록
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pending = {}  # 계산 중인 질의 → Future (같은 질의는 한 번만 계산)
+
+        self._queue = []
+        self._queue_lock = threading.Lock()
+        self._draining = False
+
+        # 📊 모니터링용 카운터
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.batched_items = 0
+
+    # ---------- 모델 ----------
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+
+        device = resolve_device(self.device)
+        backend = self.backend
+        if backend in ("int8", "onnx") and device != "cpu":
+            print(f"⚠️ EMBEDDING_BACKEND={backend} 는 CPU 전용 → device=cpu 로 실행")
+            device = "cpu"
+
+        start = time.perf_counter()
+        if backend == "onnx":
+            try:
+                model = SentenceTransformer(self.model_name, device=device, backend="onnx")
+            except Exception as e:
+                print(f"⚠️ ONNX 로드 실패, torch 로 대체: {e}")
+                backend = "torch"
+                model = SentenceTransformer(self.model_name, device=device)
+        else:
+            model = SentenceTransformer(self.model_name, device=device)
+            if backend == "int8":
+                import torch
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        self.device, self.backend = device, backend
+        print(f"🧲 임베딩 모델 로드: {self.model_name} ({device}, {backend}) {time.perf_counter() - start:.1f}s")
+        return model
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        model = self.model
+        with self._encode_lock:
+            vectors = model.encode(texts, batch_size=self.max_batch_size, normalize_embeddings=True,
+                                   convert_to_numpy=True, show_progress_bar=False)
+        return vectors.tolist()
+
+    # ---------- 동시 질의 묶기 ----------
+    def _encode_batched(self, text: str) -> List[float]:
+        """
+        먼저 온 스레드가 max_wait 동안 다른 질의를 기다렸다가 큐를 비울 때까지 대신 encode
+        → 동시에 들어온 질의가 한 번의 forward 로 처리된다
+        """
+        future = Future()
+        with self._queue_lock:
+            self._queue.append((text, future))
+            leader = not self._draining
+            if leader:
+                self._draining = True
+
+        if leader:
+            time.sleep(self.max_wait)
+            while True:
+                with self._queue_lock:
+                    batch = self._queue[:self.max_batch_size]
+                    del self._queue[:self.max_batch_size]
+                    if not batch:
+                        self._draining = False
+                        break
+                try:
+                    vectors = self._encode([t for t, _ in batch])
+                except Exception as e:
+                    for _, f in batch:
+                        f.set_exception(e)
+                    continue
+                self.batches += 1
+                self.batched_items += len(batch)
+                for (_, f), vector in zip(batch, vectors):
+                    f.set_result(vector)
+
+        return future.result()
+
+    # ---------- Embeddings 인터페이스 ----------
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return vector
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = self._pending[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            # 캐시/합치기는 정규화 키로, 인코딩은 원문 그대로 (대소문자 구분 토큰 "LH" 등이 색인과 같은 벡터가 되도록)
+            vector = self._encode_batched(text)
+        except Exception as e:
+            with self._cache_lock:
+                self._pending.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._cache_lock:
+            self._cache[key] = vector
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self._pending.pop(key, None)
+        future.set_result(vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode(list(texts))
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "model": self.model_name,
+            "device": self.device,
+            "backend": self.backend,
+            "loaded": self._model is not None,
+            "cache_size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+embedding_service = EmbeddingService()
+register(
+    "embedding",
+    lambda: embedding_service.model,
+    warm=lambda _: embedding_service.embed_documents(["워밍업"]),
+    is_loaded=lambda: embedding_service._model is not None
+)
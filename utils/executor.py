@@ -0,0 +1,32 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# ✅ 블로킹 작업(SQLite, LH API, 벡터검색, PDF 렌더링)을 돌릴 공용 스레드 풀
+#    - 이벤트 루프를 막지 않도록 async 경로에서는 모두 여기로 넘긴다
+#    - 풀 크기를 제한해 동시 요청이 몰려도 스레드가 무한정 늘지 않게 한다
+MAX_WORKERS = int(os.getenv("BLOCKING_POOL_SIZE", "8"))
+
+# ✅ 응답과 무관한 느린 백그라운드 작업(대화 요약 LLM 호출 등)은 별도의 작은 풀에서 실행
+#    - 몇 초씩 걸리는 작업이 몰려도 요청 경로의 공용 풀 스레드를 차지하지 않게 한다
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_POOL_SIZE", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="welhome-blocking")
+_background = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="welhome-background")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """동기 함수를 공용 스레드 풀에서 실행하고 결과를 await 한다."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
+def submit_background(func, *args, **kwargs):
+    """결과를 기다리지 않는 백그라운드 작업을 별도 풀에 넣는다 (concurrent.futures.Future 반환)."""
+    return _background.submit(func, *args, **kwargs)
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _background.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,156 @@
+import os
+import re
+import math
+import uuid
+import threading
+from collections import OrderedDict
+from utils.executor import submit_background
+
+# ✅ 상담 대화 기록 관리 (loan_history / housing_history)
+#    - 고정 메시지(system, 대출 상품 표 설명 턴)는 그대로 유지
+#    - 최근 HISTORY_KEEP_TURNS 턴만 원문으로 두고, 그보다 오래된 턴은 요약 대기열로 이동
+#    - 대기열은 응답을 돌려준 뒤 백그라운드 풀(BACKGROUND_POOL_SIZE)에서 LLM 으로 요약해 "이전 대화 요약" 한 건으로 합침
+#      (요약이 아직 안 끝났으면 다음 턴에는 대기열 원문을 예산 안에서 그대로 사용)
+#    - 토큰 수는 한글 1음절 ≈ 1토큰, 그 외 문자 ≈ 4자당 1토큰으로 추정 (Ollama 토크나이저 호출 없이)
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "4"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+HISTORY_SUMMARY_MAX_CHARS = int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "800"))
+
+SUMMARY_PREFIX = "[이전 대화 요약]\n"
+SUMMARY_PROMPT = (
+    "다음은 상담사와 사용자의 이전 대화야. 이후 상담에 필요한 정보(사용자 조건, 관심 상품/공고, "
+    "질문과 답변의 요지)만 남겨 5줄 이내로 요약해. 요약문만 출력해.\n\n"
+    "[기존 요약]\n{summary}\n\n[추가 대화]\n{turns}"
+)
+
+_HANGUL = re.compile(r"[가-힣]")
+MAX_JOBS = 1000
+
+
+def estimate_tokens(text: str) -> int:
+    hangul = len(_HANGUL.findall(text))
+    return hangul + math.ceil((len(text) - hangul) / 4)
+
+
+# 요약 작업은 프로세스 단위로 보관 (상태에는 JSON 으로 저장 가능한 job id 만 둔다)
+_jobs = OrderedDict()  # job_id -> concurrent.futures.Future
+_jobs_lock = threading.Lock()
+
+
+def _summarize(llm, summary: str, turns: list) -> str:
+    text = "\n".join(f"{m['role']}: {m['content']}" for m in turns)
+    result = llm.invoke(SUMMARY_PROMPT.format(summary=summary or "(없음)", turns=text))
+    return result.strip()[:HISTORY_SUMMARY_MAX_CHARS]
+
+
+class HistoryManager:
+    """
+    state[history_key]: 고정 메시지 pinned 개 + 최근 턴 (role/content dict 리스트)
+    state[memory_key]: {"summary": 요약문, "pending": 요약 대기 메시지, "job": 요약 작업 id, "job_size": 작업에 넘긴 개수}
+    """
+
+    def __init__(self, history_key: str, memory_key: str, keep_turns: int = HISTORY_KEEP_TURNS,
+                 token_budget: int = HISTORY_TOKEN_BUDGET, count_tokens=estimate_tokens):
+        self.history_key = history_key
+        self.memory_key = memory_key
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens
+
+        # 📊 모니터링용 카운터
+        self.summaries = 0
+        self.summary_failures = 0
+        self.dropped = 0
+
+    def _memory(self, state) -> dict:
+        memory = state.get(self.memory_key)
+        if not memory:
+            memory = state[self.memory_key] = {"summary": "", "pending": [], "job": None, "job_size": 0}
+        return memory
+
+    def _tokens(self, messages) -> int:
+        return sum(self.count_tokens(m["content"]) for m in messages)
+
+    def _collect_summary(self, state):
+        """끝난 요약 작업이 있으면 요약문에 반영하고 요약된 대기열을 비움"""
+        memory = self._memory(state)
+        job_id = memory.get("job")
+        if not job_id:
+            return
+        with _jobs_lock:
+            future = _jobs.get(job_id)
+            if future is not None and not future.done():
+                return
+            _jobs.pop(job_id, None)
+        memory["job"] = None
+        if future is None:
+            return  # 다른 워커/재시작 등으로 작업을 잃음 → 다음 compact 에서 다시 요약
+        try:
+            memory["summary"] = future.result()
+            memory["pending"] = memory["pending"][memory["job_size"]:]
+            self.summaries += 1
+        except Exception as e:
+            self.summary_failures += 1
+            print(f"⚠️ 대화 요약 실패, 다음 턴에 다시 시도: {e}")
+        memory["job_size"] = 0
+
+    def has_context(self, state, pinned: int) -> bool:
+        """고정 메시지 외에 이전 턴/요약이 있는지 (있으면 답변이 이 대화에 따라 달라질 수 있음)"""
+        memory = state.get(self.memory_key) or {}
+        return len(state.get(self.history_key) or []) > pinned or bool(memory.get("summary") or memory.get("pending"))
+
+    def append(self, state, role: str, content: str):
+        state[self.history_key].append({"role": role, "content": content})
+
+    def messages(self, state, pinned: int, extra=()):
+        """LLM 에 보낼 메시지: 고정 메시지 + 요약 + (예산 안의) 요약 대기 원문 + 최근 턴 + extra"""
+        self._collect_summary(state)
+        memory = self._memory(state)
+        history = state[self.history_key]
+        head, recent = history[:pinned], history[pinned:]
+        if memory["summary"]:
+            head = head + [{"role": "system", "content": SUMMARY_PREFIX + memory["summary"]}]
+
+        pending = list(memory["pending"])
+        budget = self.token_budget - self._tokens(head) - self._tokens(recent) - self._tokens(extra)
+        while pending and self._tokens(pending) > budget:
+            pending = pending[2:] if len(pending) > 1 else []
+        return head + pending + recent + list(extra)
+
+    def compact(self, state, pinned: int, llm):
+        """턴을 마친 뒤 호출: 오래된 턴을 요약 대기열로 옮기고 요약 작업을 백그라운드로 시작"""
+        self._collect_summary(state)
+        memory = self._memory(state)
+        history = state[self.history_key]
+
+        def over_limit():
+            turns = len(history) - pinned
+            if turns <= 2:
+                return False
+            return turns > self.keep_turns * 2 or self._tokens(history) > self.token_budget
+
+        while over_limit():
+            memory["pending"].extend(history[pinned:pinned + 2])
+            del history[pinned:pinned + 2]
+
+        # 요약이 계속 실패해도 대기열이 한없이 커지지 않게
+        limit = self.keep_turns * 4
+        if len(memory["pending"]) > limit:
+            overflow = len(memory["pending"]) - limit
+            del memory["pending"][:overflow]
+            memory["job_size"] = max(0, memory["job_size"] - overflow)
+            self.dropped += overflow
+
+        if memory["pending"] and not memory.get("job"):
+            job_id = uuid.uuid4().hex
+            future = submit_background(_summarize, llm, memory["summary"], list(memory["pending"]))
+            with _jobs_lock:
+                _jobs[job_id] = future
+                while len(_jobs) > MAX_JOBS:
+                    _jobs.popitem(last=False)
+            memory["job"] = job_id
+            memory["job_size"] = len(memory["pending"])
+
+    def stats(self) -> dict:
+        return {"summaries": self.summaries, "summary_failures": self.summary_failures,
+                "dropped": self.dropped, "keep_turns": self.keep_turns, "token_budget": self.token_budget}
@@ -0,0 +1,93 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ✅ 무거운 구성요소(ClovaX, 에이전트 LLM, bge-m3, Chroma)를 import 시점이 아니라
+#    첫 사용(또는 /warmup, 시작 후 백그라운드 워밍업) 때 로드
+#    - 서버는 바로 떠서 정적 페이지를 서비스하고, /ready 로 어떤 구성요소가 준비됐는지 확인
+
+
+class LazyComponent:
+    """
+    loader() 결과를 처음 get() 할 때 한 번만 만들어 보관
+    - warm(obj): 첫 추론 비용을 미리 치르는 함수
+    - is_loaded(): 자체적으로 지연 로딩하는 객체(임베딩 서비스 등)의 로드 여부 확인용
+    """
+
+    def __init__(self, name: str, loader, warm=None, is_loaded=None):
+        self.name = name
+        self._loader = loader
+        self._warm = warm
+        self._is_loaded = is_loaded
+        self._value = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        self.warm_seconds = None
+        self.error = None
+
+    @property
+    def loaded(self) -> bool:
+        if self._is_loaded is not None:
+            return self._is_loaded()
+        return self._value is not None
+
+    def get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    start = time.perf_counter()
+                    try:
+                        value = self._loader()
+                    except Exception as e:
+                        self.error = str(e)
+                        raise
+                    self.load_seconds = round(time.perf_counter() - start, 2)
+                    self.error = None
+                    self._value = value
+                    print(f"✅ {self.name} 로드 완료 ({self.load_seconds}s)")
+        return self._value
+
+    def warmup(self):
+        value = self.get()
+        if self._warm is not None and self.warm_seconds is None:
+            start = time.perf_counter()
+            self._warm(value)
+            self.warm_seconds = round(time.perf_counter() - start, 2)
+
+    def status(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            "warmed": self.warm_seconds is not None,
+            "warm_seconds": self.warm_seconds,
+            "error": self.error,
+        }
+
+
+_components = {}
+
+
+def register(name: str, loader, warm=None, is_loaded=None) -> LazyComponent:
+    component = _components[name] = LazyComponent(name, loader, warm, is_loaded)
+    return component
+
+
+def readiness() -> dict:
+    return {name: component.status() for name, component in _components.items()}
+
+
+def warmup_all(names=None) -> dict:
+    """구성요소를 동시에 로드/워밍업 (하나가 실패해도 나머지는 진행). 결과는 readiness() 형식"""
+    targets = [c for name, c in _components.items() if names is None or name in names]
+
+    def _warm(component):
+        try:
+            component.warmup()
+        except Exception as e:
+            component.error = str(e)
+            print(f"❌ {component.name} 워밍업 실패: {e}")
+
+    if targets:
+        with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="welhome-warmup") as pool:
+            list(pool.map(_warm, targets))
+    return {c.name: c.status() for c in targets}
@@ -1,63 +1,277 @@
+import os
 import sqlite3
-import pandas as pd
+import threading
+import numpy as np
+from urllib.parse import quote
 
 DB_PATH = "/home/alpaco/lyj0622/project/data/loan_type.db"
 
+COLUMNS = ["bank", "product", "repay_type", "rate_avg_prev", "limit_amt", "cost_total"]
+
+# 상환유형 → 코드 (벡터 계산용)
+REPAY_TYPES = ["만기일시상환", "원리금분할상환", "원금분할상환"]
+BULLET, ANNUITY, EQUAL_PRINCIPAL = 0, 1, 2
+UNKNOWN = -1
+
+
+class LoanProductTable:
+    """loan_products 테이블을 컬럼별 NumPy 배열로 보관"""
+
+    def __init__(self, rows):
+        self.bank = np.array([r[0] for r in rows], dtype=object)
+        self.product = np.array([r[1] for r in rows], dtype=object)
+        self.repay_type = np.array([r[2] for r in rows], dtype=object)
+        self.rate = np.array([r[3] for r in rows], dtype=float)
+        self.limit_amt = np.array([r[4] for r in rows], dtype=float)
+        self.repay_code = np.array(
+            [REPAY_TYPES.index(t) if t in REPAY_TYPES else UNKNOWN for t in self.repay_type]
+        )
+        # 정렬 키로 쓰기 위해 은행명을 문자열 배열로도 보관
+        self.bank_key = self.bank.astype(str)
+
+    def __len__(self):
+        return len(self.rate)
+
+
+_tables = {}  # db_path -> (파일 서명, LoanProductTable)
+_tables_lock = threading.Lock()
+
+
+def load_product_table(db_path: str = DB_PATH) -> LoanProductTable:
+    """
+    상품 테이블은 한 번만 읽고 메모리에 보관
+    loan_type.db 파일의 (수정시각, 크기)가 바뀌면 다시 읽는다
+    """
+    st = os.stat(db_path)
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _tables.get(db_path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    with _tables_lock:
+        cached = _tables.get(db_path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        # 공용 커넥션(immutable 일 수 있음) 대신 새로 열어 항상 최신 내용을 읽음
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}?mode=ro", uri=True)
+        try:
+            rows = conn.execute(
+                "SELECT bank, product, repay_type, rate_avg_prev, limit_amt FROM loan_products"
+            ).fetchall()
+        finally:
+            conn.close()
+        table = LoanProductTable(rows)
+        _tables[db_path] = (signature, table)
+        print(f"🏦 대출 상품 테이블 로드: {len(table)}건")
+        return table
+
+
+def calculate_cost_totals(rates, repay_codes, amount, years):
+    """
+    총 상환비용 (닫힌 식, 브로드캐스팅 지원)
+    - 만기일시상환:   A * (1 + r * y)
+    - 원리금분할상환: n * A * m(1+m)^n / ((1+m)^n - 1)   (m = r/12, n = 12y, m=0 이면 A)
+    - 원금분할상환:   A * (1 + m * (n + 1) / 2)          (매달 잔액 * m 의 합)
+    알 수 없는 상환유형은 NaN
+    """
+    r = np.asarray(rates, dtype=float) / 100
+    codes = np.asarray(repay_codes)
+    amount = np.asarray(amount, dtype=float)
+    years = np.asarray(years, dtype=float)
+
+    m = r / 12
+    n = years * 12
+
+    bullet = amount * (1 + r * years)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        growth = (1 + m) ** n
+        annuity = np.where(m == 0, amount, n * amount * m * growth / (growth - 1))
+
+    equal_principal = amount * (1 + m * (n + 1) / 2)
+
+    total = np.select(
+        [codes == BULLET, codes == ANNUITY, codes == EQUAL_PRINCIPAL],
+        [bullet, annuity, equal_principal],
+        default=np.nan
+    )
+    return np.round(total)
+
+
 def calculate_cost_total(row, amount, years):
-    rate = row["rate_avg_prev"]
+    """상품 한 건(row: rate_avg_prev, repay_type)의 총 상환비용"""
     repay_type = row["repay_type"]
-    r = rate / 100
-
-    if repay_type == "만기일시상환":
-        total = amount + (amount * r * years)
-        return round(total)
-
-    elif repay_type == "원리금분할상환":
-        monthly_rate = r / 12
-        n = years * 12
-        if monthly_rate == 0:
-            monthly_payment = amount / n
-        else:
-            monthly_payment = amount * monthly_rate * (1 + monthly_rate) ** n / ((1 + monthly_rate) ** n - 1)
-        total = monthly_payment * n
-        return round(total)
-
-    elif repay_type == "원금분할상환":
-        n = years * 12
-        monthly_principal = amount / n
-        total = 0
-        for i in range(1, n + 1):
-            remaining_principal = amount - monthly_principal * (i - 1)
-            interest = remaining_principal * (r / 12)
-            total += monthly_principal + interest
-        return round(total)
-    else:
+    if repay_type not in REPAY_TYPES:
         return None
+    total = calculate_cost_totals(row["rate_avg_prev"], REPAY_TYPES.index(repay_type), amount, years)
+    return int(total)
+
+
+def _format_cell(value):
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return ""
+        return str(int(value)) if float(value).is_integer() else str(value)
+    return str(value)
+
+
+def _to_markdown(columns, rows) -> str:
+    """pandas.DataFrame.to_markdown(index=False) 와 같은 파이프 표 (문자 열 왼쪽, 숫자 열 오른쪽 정렬)"""
+    numeric = {"rate_avg_prev", "limit_amt", "cost_total"}
+    header = "| " + " | ".join(columns) + " |"
+    align = "|" + "|".join("---:" if c in numeric else ":---" for c in columns) + "|"
+    body = ["| " + " | ".join(_format_cell(v) for v in row) + " |" for row in rows]
+    return "\n".join([header, align] + body)
+
+
+def select_best_products(table: LoanProductTable, loan_amount, loan_years, per_bank: int = 2):
+    """한도 안의 상품을 은행별 총 상환비용 낮은 순으로 per_bank 개씩 (인덱스, 비용)"""
+    cost = calculate_cost_totals(table.rate, table.repay_code, loan_amount, loan_years)
+
+    candidates = np.flatnonzero(table.limit_amt >= loan_amount)
+    if candidates.size == 0:
+        return candidates, cost
+
+    # 은행명 → 총 상환비용 순 정렬 (NaN 은 맨 뒤)
+    order = candidates[np.lexsort((cost[candidates], table.bank_key[candidates]))]
+    banks = table.bank_key[order]
+    is_start = np.r_[True, banks[1:] != banks[:-1]]
+    positions = np.arange(len(order))
+    rank_in_bank = positions - np.maximum.accumulate(np.where(is_start, positions, 0))
+    return order[rank_in_bank < per_bank], cost
+
 
 def get_table_text(loan_amount, loan_years, db_path):
-    conn = sqlite3.connect(db_path)
-    query = """
-        SELECT 
-            bank,
-            product,
-            repay_type,
-            rate_avg_prev,
-            limit_amt
-        FROM loan_products
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-
-    df["cost_total"] = df.apply(
-        lambda row: calculate_cost_total(row, loan_amount, loan_years),
-        axis=1
+    table = load_product_table(db_path)
+    selected, cost = select_best_products(table, loan_amount, loan_years)
+    if selected.size == 0:
+        return None
+
+    rows = [
+        (table.bank[i], table.product[i], table.repay_type[i], table.rate[i], table.limit_amt[i], cost[i])
+        for i in selected
+    ]
+    return _to_markdown(COLUMNS, rows)
+
+
+def calculate_monthly_payments(rates, repay_codes, amount, years):
+    """
+    첫 달 납입액 (브로드캐스팅 지원)
+    - 만기일시상환: 이자만 A * m (원금은 만기에 일시 상환)
+    - 원리금분할상환: 매달 같은 금액
+    - 원금분할상환: A/n + A*m (이후 매달 줄어듦)
+    """
+    r = np.asarray(rates, dtype=float) / 100
+    codes = np.asarray(repay_codes)
+    amount = np.asarray(amount, dtype=float)
+    years = np.asarray(years, dtype=float)
+
+    m = r / 12
+    n = years * 12
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        growth = (1 + m) ** n
+        annuity = np.where(m == 0, amount / n, amount * m * growth / (growth - 1))
+
+    payment = np.select(
+        [codes == BULLET, codes == ANNUITY, codes == EQUAL_PRINCIPAL],
+        [amount * m, annuity, amount / n + amount * m],
+        default=np.nan
     )
+    return np.round(payment)
 
-    df_filtered = df[df["limit_amt"] >= loan_amount]
-    df_sorted = df_filtered.sort_values(["bank", "cost_total"])
-    best_two = df_sorted.groupby("bank").head(2).reset_index(drop=True)
 
-    if best_two.empty:
-        return None
-    
-    return best_two.to_markdown(index=False)
+def amortization_schedules(rates, repay_codes, amount, years):
+    """
+    상품별 월별 상환 스케줄 (상품 수 P × 개월 수 n 배열을 한 번에 계산)
+    Returns: dict(payment, principal, interest, balance) 각 (P, n) 배열
+    """
+    r = np.asarray(rates, dtype=float)[:, None] / 100
+    codes = np.asarray(repay_codes)[:, None]
+    m = r / 12
+    n = int(years * 12)
+    k = np.arange(1, n + 1)[None, :]  # 회차
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        growth_n = (1 + m) ** n
+        annuity = np.where(m == 0, amount / n, amount * m * growth_n / (growth_n - 1))
+        # 원리금분할: k 회차 후 잔액 = A(1+m)^k - p((1+m)^k - 1)/m
+        growth_k = (1 + m) ** k
+        annuity_balance = np.where(
+            m == 0, amount - annuity * k, amount * growth_k - annuity * (growth_k - 1) / np.where(m == 0, 1, m)
+        )
+
+    bullet_balance = np.where(k < n, amount, 0.0) * np.ones_like(m)
+    principal_balance = amount - amount / n * k * np.ones_like(m)
+    balance = np.select(
+        [codes == BULLET, codes == ANNUITY, codes == EQUAL_PRINCIPAL],
+        [bullet_balance, annuity_balance, principal_balance],
+        default=np.nan
+    )
+    balance = np.maximum(balance, 0)
+    prev_balance = np.concatenate([np.full((balance.shape[0], 1), float(amount)), balance[:, :-1]], axis=1)
+    interest = prev_balance * m
+    principal = prev_balance - balance
+    return {
+        "payment": np.round(principal + interest),
+        "principal": np.round(principal),
+        "interest": np.round(interest),
+        "balance": np.round(balance),
+    }
+
+
+def _compact(values, mask):
+    """NaN/대상 아님 → None, 나머지는 int 로 바꾼 중첩 리스트 (JSON 용)"""
+    valid = mask & ~np.isnan(values)
+    out = np.where(valid, values, 0).astype(np.int64).astype(object)
+    out[~valid] = None
+    return out.tolist()
+
+
+def compute_loan_grid(amounts, years, db_path: str = DB_PATH, schedule_amount=None, schedule_years=None):
+    """
+    대출금액 × 기간 × 상품 전체 격자의 총 상환비용/첫 달 납입액을 한 번에 계산 (차트용 JSON)
+    - cost_total / monthly_payment: [상품][금액][기간], 한도 초과 상품은 null
+    - best_product: [금액][기간] 총 상환비용이 가장 낮은 상품 인덱스 (없으면 null)
+    - schedule_amount, schedule_years 를 주면 해당 조건의 상품별 월별 상환 스케줄 포함
+    """
+    table = load_product_table(db_path)
+    amount_arr = np.asarray(amounts, dtype=float)
+    year_arr = np.asarray(years, dtype=float)
+
+    rate = table.rate[:, None, None]
+    code = table.repay_code[:, None, None]
+    A = amount_arr[None, :, None]
+    Y = year_arr[None, None, :]
+
+    cost = calculate_cost_totals(rate, code, A, Y)
+    monthly = calculate_monthly_payments(rate, code, A, Y)
+    eligible = np.broadcast_to(table.limit_amt[:, None, None] >= A, cost.shape)
+
+    masked_cost = np.where(eligible, cost, np.inf)
+    masked_cost = np.where(np.isnan(masked_cost), np.inf, masked_cost)
+    best = np.argmin(masked_cost, axis=0) if len(table) else np.zeros(cost.shape[1:], dtype=int)
+    has_best = np.isfinite(np.min(masked_cost, axis=0)) if len(table) else np.zeros(cost.shape[1:], dtype=bool)
+
+    result = {
+        "products": [
+            {"bank": table.bank[i], "product": table.product[i], "repay_type": table.repay_type[i],
+             "rate_avg_prev": float(table.rate[i]), "limit_amt": int(table.limit_amt[i])}
+            for i in range(len(table))
+        ],
+        "amounts": amount_arr.astype(np.int64).tolist(),
+        "years": year_arr.astype(np.int64).tolist(),
+        "cost_total": _compact(cost, eligible),
+        "monthly_payment": _compact(monthly, eligible),
+        "best_product": _compact(best.astype(float), has_best),
+    }
+
+    if schedule_amount and schedule_years:
+        schedule_eligible = table.limit_amt >= schedule_amount
+        schedules = amortization_schedules(table.rate, table.repay_code, float(schedule_amount), schedule_years)
+        row_mask = np.broadcast_to(schedule_eligible[:, None], schedules["balance"].shape)
+        result["schedule"] = {
+            "amount": int(schedule_amount),
+            "years": int(schedule_years),
+            **{key: _compact(values, row_mask) for key, values in schedules.items()}
+        }
+    return result
@@ -0,0 +1,183 @@
+import os
+import re
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+from pdf2image import convert_from_path
+
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", "static/pages")
+PAGE_CACHE_MAX_MB = int(os.getenv("PAGE_CACHE_MAX_MB", "512"))
+PAGE_CACHE_MAX_FILES = int(os.getenv("PAGE_CACHE_MAX_FILES", "2000"))
+PAGE_CACHE_GRACE_S = float(os.getenv("PAGE_CACHE_GRACE_S", "60"))  # 최근 이 시간 안에 쓴 파일은 삭제하지 않음
+DEFAULT_DPI = 200  # pdf2image 기본값과 동일
+TMP_MAX_AGE_S = 3600  # 이보다 오래된 .tmp 만 잔여물로 보고 삭제 (다른 워커가 렌더링 중일 수 있음)
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+_FORMATS = {"png": "PNG", "jpeg": "JPEG"}
+
+
+def is_safe_id(value) -> bool:
+    """notice_id / 파일명에 경로 문자가 섞이지 않았는지 확인 (클라이언트가 보낸 값)"""
+    return bool(value) and bool(_SAFE_ID.match(str(value)))
+
+
+class PageImageCache:
+    """
+    공고 PDF 페이지 이미지 디스크 캐시
+    - 키: (notice_id, page, dpi, format) + PDF 파일 서명(크기, 수정시각)
+      → PDF 가 바뀌면 파일명도 바뀌므로 파일명 자체를 ETag / immutable URL 로 쓸 수 있다
+    - 임시 파일에 저장 후 os.replace 로 교체 (원자적 쓰기)
+    - 같은 키를 동시에 요청하면 한 번만 렌더링하고 나머지는 결과를 기다렸다가 재사용
+      (다른 워커가 이미 디스크에 렌더링한 파일도 다시 만들지 않고 색인에 넣어 재사용)
+    - 총 용량/파일 수 제한을 넘으면 가장 오래 안 쓴 파일부터 삭제 (LRU)
+      단, 최근 PAGE_CACHE_GRACE_S 안에 쓴 파일(mtime, 다른 워커 포함)은 방금 경로를 돌려준 것일 수 있어 남김
+    """
+
+    def __init__(self, cache_dir: str = PAGE_CACHE_DIR, max_bytes: int = PAGE_CACHE_MAX_MB * 1024 * 1024,
+                 max_files: int = PAGE_CACHE_MAX_FILES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._index = OrderedDict()  # filename -> bytes (오래된 순)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._render_locks = {}
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """재시작 시 기존 캐시 파일을 마지막 사용 시각(mtime) 순으로 색인"""
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp"):
+                # 중간에 죽은 렌더링 잔여물 (최근 것은 다른 워커가 아직 쓰는 중일 수 있음)
+                try:
+                    if now - os.stat(path).st_mtime > TMP_MAX_AGE_S:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            if os.path.isfile(path) and name.rsplit(".", 1)[-1] in _FORMATS:
+                st = os.stat(path)
+                entries.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _filename(self, pdf_path: str, notice_id: str, page: int, dpi: int, fmt: str) -> str:
+        st = os.stat(pdf_path)
+        signature = hashlib.sha1(f"{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:12]
+        return f"{notice_id}_p{page}_d{dpi}_{signature}.{fmt}"
+
+    def path_for(self, filename: str) -> Optional[str]:
+        """캐시에 있는 파일이면 경로, 아니면 None"""
+        name, _, ext = filename.rpartition(".")
+        if not is_safe_id(name) or ext not in _FORMATS:
+            return None
+        path = os.path.join(self.cache_dir, filename)
+        return path if os.path.isfile(path) else None
+
+    def _touch(self, filename: str) -> bool:
+        with self._lock:
+            if filename not in self._index:
+                return False
+            self._index.move_to_end(filename)
+        try:
+            os.utime(os.path.join(self.cache_dir, filename))
+        except FileNotFoundError:
+            with self._lock:
+                self._total_bytes -= self._index.pop(filename, 0)
+            return False
+        return True
+
+    def _add(self, filename: str, size: int):
+        with self._lock:
+            self._total_bytes += size - self._index.get(filename, 0)
+            self._index[filename] = size
+            self._index.move_to_end(filename)
+            self._evict()
+
+    def _evict(self):
+        # 방금 추가한 파일(맨 뒤)은 남긴다. 유예 시간 안의 파일만 남았으면 잠시 제한을 넘겨도 그대로 둠
+        now = time.time()
+        skipped = 0
+        while len(self._index) > 1 and skipped < len(self._index) and (
+            self._total_bytes > self.max_bytes or len(self._index) > self.max_files
+        ):
+            filename = next(iter(self._index))
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                recently_used = now - os.stat(path).st_mtime < PAGE_CACHE_GRACE_S
+            except FileNotFoundError:
+                self._total_bytes -= self._index.pop(filename)
+                continue
+            if recently_used:
+                self._index.move_to_end(filename)
+                skipped += 1
+                continue
+            self._total_bytes -= self._index.pop(filename)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get_or_render(self, pdf_path: str, notice_id: str, page: int,
+                      dpi: int = DEFAULT_DPI, fmt: str = "png") -> Optional[str]:
+        """해당 페이지 이미지의 캐시 파일명을 돌려줌 (없으면 렌더링). 실패하면 None"""
+        if not is_safe_id(notice_id) or fmt not in _FORMATS or not os.path.exists(pdf_path):
+            return None
+
+        filename = self._filename(pdf_path, notice_id, page, dpi, fmt)
+        if self._touch(filename):
+            self.hits += 1
+            return filename
+
+        with self._lock:
+            render_lock = self._render_locks.setdefault(filename, threading.Lock())
+        with render_lock:
+            try:
+                # 기다리는 동안 다른 요청이 이미 렌더링했으면 그대로 사용
+                if self._touch(filename):
+                    self.hits += 1
+                    return filename
+
+                # 다른 워커가 디스크에 이미 렌더링해 둔 파일이면 색인에 넣고 재사용
+                path = os.path.join(self.cache_dir, filename)
+                try:
+                    os.utime(path)
+                    self._add(filename, os.path.getsize(path))
+                    self.hits += 1
+                    return filename
+                except FileNotFoundError:
+                    pass
+
+                self.misses += 1
+                images = convert_from_path(pdf_path, dpi=dpi, first_page=page, last_page=page)
+                if not images:
+                    print("⚠️ PDF에서 페이지 변환 실패")
+                    return None
+
+                tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                try:
+                    images[0].save(tmp_path, _FORMATS[fmt])
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    try:
+                        os.remove(tmp_path)
+                    except FileNotFoundError:
+                        pass
+                    raise
+                self._add(filename, os.path.getsize(path))
+                print(f"✅ 페이지 이미지 캐시 저장: {path}")
+                return filename
+            finally:
+                with self._lock:
+                    self._render_locks.pop(filename, None)
@@ -1,12 +1,19 @@
-def escape(value: str) -> str:
-    return value.replace("'", "''")
+from typing import Dict, Tuple
 
-def build_where_clause(user_state: dict) -> str:
+
+def build_where_clause(user_state: dict) -> Tuple[str, Dict]:
+    """
+    사용자 상태 → (WHERE 절, 바인딩 파라미터)
+    - 값은 SQL 문자열에 직접 넣지 않고 :이름 파라미터로 바인딩
+    - 어떤 항목이 입력됐는지에 따라서만 문장 모양이 바뀌므로 (값과 무관)
+      가능한 SQL 문장 수가 유한하고, 커넥션의 prepared statement 캐시에서 재사용된다
+    """
     conditions = []
+    params = {}
 
     if user_state.get("계층"):
-        user_type = escape(user_state["계층"])
-        conditions.append(f"('{user_type}' = p.eligible_user_type OR p.eligible_user_type = '전체')")
+        conditions.append("(:user_type = p.eligible_user_type OR p.eligible_user_type = '전체')")
+        params["user_type"] = str(user_state["계층"])
 
     if user_state.get("무주택") is True:
         conditions.append("p.is_no_house = 1")
@@ -17,20 +24,23 @@ def build_where_clause(user_state: dict) -> str:
         conditions.append("p.is_householder = 0")
 
     if user_state.get("총자산") is not None:
-        conditions.append(f"{user_state['총자산']} <= ar.max_asset")
+        conditions.append(":total_asset <= ar.max_asset")
+        params["total_asset"] = user_state["총자산"]
 
     if user_state.get("자동차가액") is not None:
-        conditions.append(f"{user_state['자동차가액']} <= ar.max_car_value")
+        conditions.append(":car_value <= ar.max_car_value")
+        params["car_value"] = user_state["자동차가액"]
 
     if user_state.get("소득") is not None:
         try:
-            income = int(user_state["소득"])
+            params["income"] = int(user_state["소득"])
             conditions.append(
-                f"{income} <= ref.income * ("
-                f"CASE WHEN p.has_bonus_score = 1 THEN ir.income_limit_pct + IFNULL(br.point, 0) "
-                f"ELSE ir.income_limit_pct END)"
+                ":income <= ref.income * ("
+                "CASE WHEN p.has_bonus_score = 1 THEN ir.income_limit_pct + IFNULL(br.point, 0) "
+                "ELSE ir.income_limit_pct END)"
             )
         except ValueError:
             pass
 
-    return "WHERE " + " AND ".join(conditions) if conditions else ""
+    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+    return where_clause, params
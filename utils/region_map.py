@@ -1,32 +1,175 @@
-import sqlite3
-from typing import Optional
+import re
+import threading
+from typing import Optional, List, Tuple
+from utils.sqlite_pool import get_connection
 
 DB_PATH = "/home/alpaco/lyj0622/project_real/data/housing_type.db"
 
-def get_region_code(region_name: str) -> Optional[str]:
-    if not region_name:
-        return None
+# 행정구역 접미사 (긴 것부터 제거) → "서울특별시" 에서 "서울" 별칭을 만든다
+SUFFIXES = ["특별자치시", "특별자치도", "특별시", "광역시", "도", "시"]
 
-    region_name = region_name.strip()
+# 접미사 제거만으로 안 나오는 관용 약칭
+EXTRA_ALIASES = {
+    "충청북도": ["충북"], "충청남도": ["충남"],
+    "전라북도": ["전북"], "전북특별자치도": ["전북", "전라북도"], "전라남도": ["전남"],
+    "경상북도": ["경북"], "경상남도": ["경남"],
+    "강원특별자치도": ["강원도"], "제주특별자치도": ["제주도"],
+}
 
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        query = """
-            SELECT cnp_cd
-            FROM region_code
-            WHERE cnp_name LIKE ?
-            LIMIT 1
-        """
-        cursor.execute(query, (f"%{region_name}%",))
-        row = cursor.fetchone()
-
-        return row[0] if row else None
+_TOKEN_SPLIT = re.compile(r"[\s,/·]+")
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"[^\w]", "", text).lower()
+
+
+def _aliases(name: str) -> List[str]:
+    base = normalize(name)
+    aliases = {base}
+    for suffix in SUFFIXES:
+        if base.endswith(suffix) and len(base) - len(suffix) >= 2:
+            short = base[:-len(suffix)]
+            aliases.update({short, short + "시"} if suffix.endswith("시") else {short})
+            break
+    aliases.update(normalize(a) for a in EXTRA_ALIASES.get(name.strip(), []))
+    return sorted(aliases)
+
+
+def _edit_distance(a: str, b: str) -> int:
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+class RegionIndex:
+    """
+    region_code 테이블 메모리 색인
+    - 정규화한 이름 + 별칭(서울/서울시/서울특별시 ...) 정확 일치
+    - 접두사 트라이: "서울강남구" 처럼 별칭으로 시작하는 입력, "경" 처럼 별칭의 앞부분인 입력
+    - 부분 문자열(기존 LIKE '%x%' 동작)과 편집거리 보정(오타)은 마지막 단계
+    - candidates() 는 점수 순 후보 목록을 돌려준다
+    """
+
+    def __init__(self, rows: List[Tuple[str, str]]):
+        self.names = {}  # cnp_cd -> cnp_name
+        self.alias_to_codes = {}
+        self.trie = {}
+        for code, name in rows:
+            if not name:
+                continue
+            self.names[code] = name
+            for alias in _aliases(name):
+                self.alias_to_codes.setdefault(alias, set()).add(code)
+                node = self.trie
+                for ch in alias:
+                    node = node.setdefault(ch, {})
+                node.setdefault("$", set()).add(code)
+
+    def _prefix_matches(self, token: str):
+        """(별칭이 token 의 접두사인 코드들, token 이 별칭의 접두사인 코드들)"""
+        node = self.trie
+        leading = {}
+        for i, ch in enumerate(token, 1):
+            node = node.get(ch)
+            if node is None:
+                return leading, set()
+            for code in node.get("$", ()):
+                leading[code] = i  # 더 긴 별칭이 나중에 덮어씀
+        completions = set()
+        stack = [node]
+        while stack:
+            cur = stack.pop()
+            for key, child in cur.items():
+                if key == "$":
+                    completions.update(child)
+                else:
+                    stack.append(child)
+        return leading, completions
+
+    def candidates(self, region_name: str, limit: int = 5) -> List[Tuple[str, str, float]]:
+        if not region_name or not region_name.strip():
+            return []
+
+        scores = {}
+
+        def add(code, score):
+            if score > scores.get(code, 0):
+                scores[code] = score
 
+        whole = normalize(region_name)
+        tokens = [normalize(t) for t in _TOKEN_SPLIT.split(region_name.strip()) if normalize(t)]
+
+        for code in self.alias_to_codes.get(whole, ()):
+            add(code, 1.0)
+        for pos, token in enumerate(tokens):
+            # 앞쪽 토큰일수록 광역 단위일 가능성이 높음 ("서울시 강남")
+            weight = 1.0 - 0.02 * pos
+            for code in self.alias_to_codes.get(token, ()):
+                add(code, 0.95 * weight)
+            leading, completions = self._prefix_matches(token)
+            for code, length in leading.items():
+                add(code, (0.8 + 0.1 * length / len(token)) * weight)
+            if len(completions) <= 3:
+                for code in completions:
+                    add(code, 0.75 * weight)
+
+        if not scores:
+            for code, name in self.names.items():
+                if whole and whole in normalize(name):
+                    add(code, 0.7)
+
+        if not scores:
+            for token in tokens or [whole]:
+                # 두 글자 지명은 한 글자만 달라도 다른 지역이 되므로(강남/강원) 3글자 이상부터 허용
+                max_dist = len(token) // 3
+                if max_dist == 0:
+                    continue
+                for alias, codes in self.alias_to_codes.items():
+                    dist = _edit_distance(token, alias)
+                    if dist <= max_dist:
+                        for code in codes:
+                            add(code, 0.6 - 0.1 * dist)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(code, self.names[code], round(score, 3)) for code, score in ranked[:limit]]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_region_index() -> RegionIndex:
+    """region_code 테이블을 처음 한 번만 읽어 색인 생성"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                rows = get_connection(DB_PATH).execute("SELECT cnp_cd, cnp_name FROM region_code").fetchall()
+                _index = RegionIndex([(row[0], row[1]) for row in rows])
+                print(f"🗺 지역 색인 로드: {len(_index.names)}개, 별칭 {len(_index.alias_to_codes)}개")
+    return _index
+
+
+def reload_region_index():
+    global _index
+    with _index_lock:
+        _index = None
+    return get_region_index()
+
+
+def find_region_candidates(region_name: str, limit: int = 5) -> List[Tuple[str, str, float]]:
+    """[(cnp_cd, cnp_name, score), ...] 점수 높은 순"""
+    try:
+        return get_region_index().candidates(region_name, limit)
     except Exception as e:
         print(f"❗ 지역 코드 조회 중 오류 발생: {e}")
-        return None
+        return []
+
 
-    finally:
-        if 'conn' in locals():
-            conn.close()
+def get_region_code(region_name: str) -> Optional[str]:
+    found = find_region_candidates(region_name, limit=1)
+    return found[0][0] if found else None
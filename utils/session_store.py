@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+
+# ✅ 세션별 대화 상태 저장소 (클라이언트는 query + session_id 만 보냄)
+#    - SESSION_BACKEND=memory(기본): 프로세스 메모리 LRU
+#      sqlite: SESSION_DB_PATH 파일에 JSON 으로 저장 (재시작/여러 워커 간 유지)
+#    - SESSION_TTL 초 동안 사용이 없으면 만료, SESSION_MAX_SESSIONS 를 넘으면 오래된 세션부터 제거
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/sessions.db")
+SESSION_TTL = float(os.getenv("SESSION_TTL", "3600"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "5000"))
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def is_valid_session_id(session_id) -> bool:
+    return isinstance(session_id, str) and len(session_id) == 32 and all(c in "0123456789abcdef" for c in session_id)
+
+
+class MemorySessionStore:
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> (data, last_used)
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evictions = 0
+
+    def load(self, session_id: str):
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return None
+            if time.time() - item[1] > self.ttl:
+                del self._sessions[session_id]
+                self.expired += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            return item[0]
+
+    def save(self, session_id: str, data: dict):
+        with self._lock:
+            self._sessions[session_id] = (data, time.time())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "sessions": len(self._sessions),
+                "expired": self.expired, "evictions": self.evictions}
+
+
+class SQLiteSessionStore:
+    """세션 하나 = 행 하나 (JSON). 만료/초과분 정리는 저장할 때 가끔 한 번에"""
+
+    CLEANUP_EVERY = 100
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl: float = SESSION_TTL,
+                 max_sessions: int = SESSION_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at)")
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def load(self, session_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, updated_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[1] > self.ttl:
+            self.delete(session_id)
+            self.expired += 1
+            return None
+        return json.loads(row[0])
+
+    def save(self, session_id: str, data: dict):
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (session_id, payload, time.time())
+            )
+            self._writes += 1
+            if self._writes % self.CLEANUP_EVERY == 0:
+                self._cleanup()
+
+    def _cleanup(self):
+        cur = self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+        self.expired += cur.rowcount
+        cur = self._conn.execute(
+            "DELETE FROM sessions WHERE id IN ("
+            "  SELECT id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,)
+        )
+        self.evictions += cur.rowcount
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {"backend": "sqlite", "sessions": count, "expired": self.expired, "evictions": self.evictions}
+
+
+def create_session_store(backend: str = SESSION_BACKEND):
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend != "memory":
+        raise ValueError(f"지원하지 않는 SESSION_BACKEND: {backend} (memory, sqlite)")
+    return MemorySessionStore()
+
+
+class SessionLocks:
+    """같은 세션의 요청은 순서대로 처리 (동시에 두 번 보내도 상태가 꼬이지 않게)"""
+
+    def __init__(self):
+        self._locks = {}  # session_id -> [lock, 사용 중인 요청 수]
+
+    def __call__(self, session_id):
+        return _SessionLock(self, session_id)
+
+
+class _SessionLock:
+    def __init__(self, owner: SessionLocks, session_id: str):
+        self.owner = owner
+        self.session_id = session_id
+
+    async def __aenter__(self):
+        if not self.session_id:
+            return  # 새 세션은 기다릴 요청이 없음
+        entry = self.owner._locks.setdefault(self.session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        await entry[0].acquire()
+
+    async def __aexit__(self, *exc):
+        if not self.session_id:
+            return
+        entry = self.owner._locks[self.session_id]
+        entry[0].release()
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.owner._locks[self.session_id]
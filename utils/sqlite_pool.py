@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import threading
+from urllib.parse import quote
+
+# ✅ 읽기 전용 SQLite 커넥션 공용 계층 (housing_type.db / loan_type.db)
+#    - 스레드마다 DB 파일별 커넥션 하나를 열어 두고 재사용 (열기/스키마 파싱 비용 1회)
+#    - URI mode=ro 로 열고, SQLITE_IMMUTABLE=1 이면 immutable=1 (파일이 안 바뀌는 배포용: 잠금 생략)
+#    - mmap I/O + 큰 페이지 캐시로 반복 조회를 메모리에서 처리
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_MB", "256")) * 1024 * 1024
+CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_MB", "64")) * 1024
+IMMUTABLE = os.getenv("SQLITE_IMMUTABLE", "0") == "1"
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+
+
+def _open(db_path: str) -> sqlite3.Connection:
+    uri = f"file:{quote(os.path.abspath(db_path))}?mode=ro"
+    if IMMUTABLE:
+        uri += "&immutable=1"
+    conn = sqlite3.connect(uri, uri=True, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")  # 음수 = KiB 단위
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+def get_connection(db_path: str) -> sqlite3.Connection:
+    """현재 스레드의 읽기 전용 커넥션 (없으면 생성). 닫지 말고 그대로 두면 다음 호출에서 재사용"""
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = conns[db_path] = _open(db_path)
+    return conn
+
+
+def reset_connection(db_path: str):
+    """현재 스레드의 커넥션을 닫음 (DB 파일 교체 후 다시 열 때)"""
+    conns = getattr(_local, "conns", {})
+    conn = conns.pop(db_path, None)
+    if conn is not None:
+        conn.close()
@@ -0,0 +1,55 @@
+import json
+import asyncio
+import threading
+
+_DONE = object()
+
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Server-Sent Events 한 건을 직렬화"""
+    payload = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+
+async def aiter_blocking(iterator):
+    """
+    블로킹 이터레이터(TextIteratorStreamer 등)를 별도 스레드에서 돌리고 항목을 비동기로 yield
+    - 공용 스레드 풀을 쓰지 않음: 토큰을 기다리며 오래 점유하므로 풀이 고갈될 수 있다
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def worker():
+        try:
+            for item in iterator:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+
+    threading.Thread(target=worker, daemon=True).start()
+    while True:
+        item = await queue.get()
+        if item is _DONE:
+            break
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+async def astream_llm(llm, prompt, on_token=None):
+    """
+    Ollama LLM 호출. on_token 콜백이 있으면 스트리밍으로 받아 토큰마다 전달하고,
+    최종적으로는 ainvoke 와 똑같이 전체 응답 문자열을 돌려준다
+    """
+    if on_token is None:
+        return await llm.ainvoke(prompt)
+
+    chunks = []
+    async for chunk in llm.astream(prompt):
+        chunks.append(chunk)
+        await on_token(chunk)
+    return "".join(chunks)
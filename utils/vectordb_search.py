@@ -1,26 +1,196 @@
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from transformers import AutoTokenizer
+import re
+import math
+import threading
+import numpy as np
+from collections import OrderedDict, Counter
 from typing import List
 from langchain.schema import Document
+from utils.embedding_service import embedding_service
+from utils.answer_cache import notice_answer_cache
+from utils.lazy import register
 
-tokenizer = AutoTokenizer.from_pretrained("BAAI/bge-m3")
-embedding_model = HuggingFaceEmbeddings(
-    model_name="BAAI/bge-m3",
-    model_kwargs={"device": "cuda"},
-    encode_kwargs={"normalize_embeddings": True}
-)
+# 질의 임베딩은 캐시/배칭이 있는 공용 서비스로 (장치는 EMBEDDING_DEVICE, 기본 auto)
+embedding_model = embedding_service
 
 persist_dir = "/home/alpaco/lyj0622/chromaDB"
-vectordb = Chroma(
-    collection_name="housing_collection",
-    persist_directory=persist_dir,
-    embedding_function=embedding_model
-)
 
-def search_notice_in_vectordb(query: str, notice_id: str, top_k: int = 1) -> List[Document]:
+
+def _open_vectordb():
+    from langchain_community.vectorstores import Chroma
+    return Chroma(
+        collection_name="housing_collection",
+        persist_directory=persist_dir,
+        embedding_function=embedding_model
+    )
+
+
+# Chroma 는 첫 검색(또는 워밍업) 때 연다
+_vectordb = register("chroma", _open_vectordb, warm=lambda db: db.get(limit=1))
+
+
+def get_vectordb():
+    return _vectordb.get()
+
+RRF_K = 60             # reciprocal rank fusion 상수
+FUSION_DEPTH = 20      # 각 검색기에서 융합에 쓰는 상위 개수
+MAX_CACHED_NOTICES = 32
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """BM25 용 토큰: 어절 + 문자 bigram (형태소 분석기 없이 '임대료는' 과 '임대료' 가 겹치도록)"""
+    tokens = []
+    for word in re.findall(r"\w+", text.lower()):
+        tokens.append(word)
+        if len(word) > 2:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+class NoticeIndex:
+    """공고 하나의 청크에 대한 메모리 색인 (dense 벡터 + BM25 역색인)"""
+
+    def __init__(self, documents: List[Document], embeddings):
+        self.documents = documents
+        self.embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(documents), -1)
+
+        self.postings = {}  # term -> [(doc_idx, tf), ...]
+        self.doc_len = np.zeros(len(documents), dtype=np.float32)
+        for idx, doc in enumerate(documents):
+            counts = Counter(tokenize(doc.page_content))
+            self.doc_len[idx] = sum(counts.values())
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((idx, tf))
+        self.avg_len = float(self.doc_len.mean()) if len(documents) else 0.0
+
+    def __len__(self):
+        return len(self.documents)
+
+    def dense_ranking(self, query_vector) -> List[int]:
+        if not len(self):
+            return []
+        scores = self.embeddings @ np.asarray(query_vector, dtype=np.float32)
+        return list(np.argsort(-scores)[:FUSION_DEPTH])
+
+    def bm25_ranking(self, query: str) -> List[int]:
+        n = len(self)
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for idx, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[idx] / (self.avg_len or 1))
+                scores[idx] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = np.argsort(-scores)[:FUSION_DEPTH]
+        return [int(i) for i in ranked if scores[i] > 0]
+
+    def search(self, query: str, query_vector, top_k: int = 1, mode: str = "hybrid") -> List[Document]:
+        dense = self.dense_ranking(query_vector) if mode in ("hybrid", "dense") else []
+        sparse = self.bm25_ranking(query) if mode in ("hybrid", "bm25") else []
+
+        fused = {}
+        for ranking in (dense, sparse):
+            for rank, idx in enumerate(ranking, 1):
+                fused[int(idx)] = fused.get(int(idx), 0.0) + 1.0 / (RRF_K + rank)
+        best = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        return [self.documents[i] for i in best]
+
+
+_notice_indexes = OrderedDict()  # notice_id -> NoticeIndex (LRU)
+_index_lock = threading.Lock()
+_build_locks = {}
+# 무효화 세대: 색인을 만드는 동안 invalidate 가 호출되면 다 만든 (이전 청크 기준) 색인은 캐시에 넣지 않음
+_generations = {}  # notice_id -> int
+_global_generation = 0
+
+
+def _generation(notice_id: str):
+    return _global_generation, _generations.get(notice_id, 0)
+
+
+def _build_notice_index(notice_id: str) -> NoticeIndex:
+    data = get_vectordb().get(where={"notice_id": notice_id}, include=["documents", "metadatas", "embeddings"])
+    ids = data.get("ids") or [None] * len(data["documents"])
+    documents = [
+        Document(page_content=text or "", metadata={**(meta or {}), "chunk_id": chunk_id})
+        for chunk_id, text, meta in zip(ids, data["documents"], data["metadatas"])
+    ]
+    embeddings = data.get("embeddings")
+    if embeddings is None or len(embeddings) != len(documents):
+        embeddings = embedding_model.embed_documents([d.page_content for d in documents]) if documents else []
+    print(f"🧱 공고 색인 생성: {notice_id} ({len(documents)}개 청크)")
+    return NoticeIndex(documents, embeddings)
+
+
+def get_notice_index(notice_id: str) -> NoticeIndex:
+    """공고별 색인 (최근 사용 MAX_CACHED_NOTICES 개 유지, 같은 공고는 한 번만 생성)"""
+    with _index_lock:
+        index = _notice_indexes.get(notice_id)
+        if index is not None:
+            _notice_indexes.move_to_end(notice_id)
+            return index
+        build_lock = _build_locks.setdefault(notice_id, threading.Lock())
+
+    with build_lock:
+        try:
+            with _index_lock:
+                index = _notice_indexes.get(notice_id)
+                generation = _generation(notice_id)
+            if index is None:
+                index = _build_notice_index(notice_id)
+                with _index_lock:
+                    if _generation(notice_id) == generation:
+                        _notice_indexes[notice_id] = index
+                        while len(_notice_indexes) > MAX_CACHED_NOTICES:
+                            _notice_indexes.popitem(last=False)
+        finally:
+            # 생성이 실패해도 락 항목이 남지 않게 (다른 스레드가 새로 만든 락이면 그대로 둠)
+            with _index_lock:
+                if _build_locks.get(notice_id) is build_lock:
+                    del _build_locks[notice_id]
+    return index
+
+
+def warm_notice_index(notice_id: str):
+    """공고 선택 시점에 색인을 미리 생성 (실패해도 검색 시 벡터 검색으로 대체되므로 무시)"""
+    try:
+        get_notice_index(notice_id)
+    except Exception as e:
+        print(f"❗ 공고 색인 생성 실패: {e}")
+
+
+def invalidate_notice_index(notice_id: str = None):
+    """공고 청크를 다시 적재했을 때 호출 (None 이면 전체). 색인과 공고 Q&A 답변 캐시를 함께 비움"""
+    global _global_generation
+    with _index_lock:
+        if notice_id is None:
+            _notice_indexes.clear()
+            _global_generation += 1
+        else:
+            _notice_indexes.pop(notice_id, None)
+            _generations[notice_id] = _generations.get(notice_id, 0) + 1
+    notice_answer_cache.invalidate(notice_id)
+
+
+def search_notice_in_vectordb(query: str, notice_id: str, top_k: int = 1, mode: str = "hybrid") -> List[Document]:
+    """
+    선택된 공고 안에서 dense + BM25 결과를 RRF 로 융합해 검색
+    (mode: "hybrid" | "dense" | "bm25")
+    """
+    try:
+        index = get_notice_index(notice_id)
+        if not len(index):
+            return []
+        query_vector = embedding_model.embed_query(query) if mode != "bm25" else None
+        return index.search(query, query_vector, top_k=top_k, mode=mode)
+    except Exception as e:
+        print(f"❗ 공고 색인 검색 오류, 벡터 검색으로 대체: {e}")
+
     try:
-        results = vectordb.similarity_search(
+        results = get_vectordb().similarity_search(
             query,
             k=top_k,
             filter={"notice_id": notice_id}